@@ -0,0 +1,284 @@
+"""
+Microbenchmarks for the analysis hot paths, run against the synthetic corpus
+with the offline LLM so no provider quota is used.
+
+    python -m benchmarks.bench --pages 5,40,200 --density 0,0.3 --repeat 3
+
+Each run times extract_pdf_text, every tool in tools.py and run_crew, cold
+(first touch of a never-seen document) and warm (caches populated), and
+appends throughput and peak RSS to a JSON-lines history. Results are compared
+with the previous run of the same configuration and regressions are flagged.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from benchmarks.corpus import generate_corpus, parse_list
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, "results", "history.jsonl")
+# Changes smaller than these are noise, whatever the ratio
+NOISE_FLOOR = {"median_s": 0.005, "peak_rss_mb": 16}
+
+
+# ------------------------
+# Peak RSS
+# ------------------------
+def reset_peak_rss() -> bool:
+    """
+    Reset the kernel's high-water mark (Linux 4.0+) so the next reading
+    covers only what runs after this call.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS; lifetime peak either way
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+# ------------------------
+# Timing
+# ------------------------
+def fresh_copy(doc: dict, workdir: str) -> str:
+    """
+    Byte-distinct copy of a corpus document: a new digest, so every cache misses.
+    """
+    with open(doc["path"], "rb") as f:
+        data = f.read()
+    path = os.path.join(workdir, f"{uuid.uuid4().hex}.pdf")
+    with open(path, "wb") as f:
+        f.write(data + f"\n% bench {uuid.uuid4().hex}\n".encode())
+    return path
+
+
+def measure(run, repeat: int) -> dict:
+    """
+    Time run() repeat times; run receives the repeat index.
+    """
+    reset_peak_rss()
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        run(i)
+        timings.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def with_throughput(stats: dict, doc: dict) -> dict:
+    seconds = stats["median_s"] or 1e-9
+    stats["pages_per_s"] = round(doc["pages"] / seconds, 2)
+    stats["mb_per_s"] = round(doc["bytes"] / (1024 * 1024) / seconds, 3)
+    return stats
+
+
+# ------------------------
+# Benchmarks
+# ------------------------
+def tool_calls(path: str) -> dict:
+    import tools
+
+    return {
+        "tool.read_financial_document": lambda: tools.FinancialDocumentTool()._run(path),
+        "tool.search_financial_document": lambda: tools.DocumentSearchTool()._run(path, "revenue growth risk"),
+        "tool.query_financial_figures": lambda: tools.FinancialFiguresTool()._run(path, currency="USD"),
+        "tool.compute_financial_metrics": lambda: tools.FinancialMetricsTool()._run(path),
+        "tool.investment_analysis": lambda: tools.InvestmentTool()._run(path),
+        "tool.risk_assessment": lambda: tools.RiskTool()._run(path),
+        "tool.verify_financial_document": lambda: tools.DocumentVerifierTool()._run(path),
+    }
+
+
+def bench_document(doc: dict, workdir: str, repeat: int, crews: list, mode: str = "full") -> list:
+    from tools import extract_pdf_text
+
+    results = []
+
+    def record(name, stats):
+        results.append({"document": doc["name"], "pages": doc["pages"],
+                        "table_density": doc["table_density"], "bytes": doc["bytes"],
+                        "benchmark": name, **with_throughput(stats, doc)})
+        print(f"  {name:<38} median {stats['median_s'] * 1000:9.1f} ms   "
+              f"{stats['pages_per_s']:9.1f} pages/s   peak {stats['peak_rss_mb']:7.1f} MB")
+
+    cold_paths = [fresh_copy(doc, workdir) for _ in range(repeat)]
+    record("extract_pdf_text.cold", measure(lambda i: extract_pdf_text(cold_paths[i]), repeat))
+    record("extract_pdf_text.warm", measure(lambda i: extract_pdf_text(cold_paths[0]), repeat))
+
+    for name in tool_calls(doc["path"]):
+        paths = [fresh_copy(doc, workdir) for _ in range(repeat)]
+        record(f"{name}.cold", measure(lambda i: tool_calls(paths[i])[name](), repeat))
+        record(f"{name}.warm", measure(lambda i: tool_calls(paths[0])[name](), repeat))
+
+    if crews:
+        import celery_tasks
+        from document_store import get_document_store
+        from task_client import ANALYZE_TASK, INVESTMENT_TASK, RISK_TASK, VERIFY_TASK
+
+        # Registered names: the mode a crew runs in is resolved per task name
+        task_names = {"analyze": ANALYZE_TASK, "investment": INVESTMENT_TASK, "risk": RISK_TASK,
+                      "verify": VERIFY_TASK}
+
+        store = get_document_store()
+        for crew_name in crews:
+            digests = []
+            for _ in range(repeat):
+                with open(fresh_copy(doc, workdir), "rb") as f:
+                    digests.append(store.put(f.read()))
+
+            def run(i):
+                result = celery_tasks.run_crew("Benchmark query", doc["name"], digests[i], crew_name,
+                                               task_names[crew_name], use_cache=False, mode=mode)
+                if result.get("error"):
+                    raise RuntimeError(result["error"])
+
+            record(f"run_crew.{crew_name}", measure(run, repeat))
+    return results
+
+
+# ------------------------
+# History and regressions
+# ------------------------
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(history_path: str, config: dict):
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("config") == config:
+                previous = record
+    return previous
+
+
+def find_regressions(results: list, previous: dict, threshold: float) -> list:
+    if previous is None:
+        return []
+    before = {(r["document"], r["benchmark"]): r for r in previous["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["document"], result["benchmark"]))
+        if old is None:
+            continue
+        for metric in ("median_s", "peak_rss_mb"):
+            grew = result[metric] - old[metric]
+            if old[metric] and result[metric] > old[metric] * threshold and grew > NOISE_FLOOR[metric]:
+                regressions.append({
+                    "document": result["document"],
+                    "benchmark": result["benchmark"],
+                    "metric": metric,
+                    "before": old[metric],
+                    "after": result[metric],
+                    "change": round(result[metric] / old[metric] - 1, 3),
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths")
+    parser.add_argument("--pages", default="5,40,200", help="comma-separated page counts")
+    parser.add_argument("--density", default="0,0.3", help="comma-separated table densities (0-1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--crews", default="analyze", help="crews to run end to end ('' to skip)")
+    parser.add_argument("--mode", default="full", choices=["auto", "full", "map_reduce"],
+                        help="analysis mode of the crew runs")
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "corpus"))
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown/growth ratio flagged")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--redis-url", default=None, help="real Redis for run_crew (default: fakeredis)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fda-bench-")
+    # Settings are read at import time, so they go in before the service modules load
+    os.environ.setdefault("LLM_BACKEND", "offline")
+    os.environ.setdefault("OFFLINE_LLM_LATENCY", "0")
+    os.environ.setdefault("OFFLINE_LLM_TOKENS_PER_SECOND", "1e9")
+    os.environ["DOCUMENT_STORE_DIR"] = os.path.join(workdir, "store")
+    os.environ["DOCUMENT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["REPORT_ARCHIVE_PATH"] = os.path.join(workdir, "archive", "reports.sqlite3")
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    else:
+        import fakeredis
+        import redis_client
+
+        redis_client._client = fakeredis.FakeRedis()
+
+    crews = parse_list(args.crews, str)
+    config = {
+        "pages": parse_list(args.pages, int),
+        "density": parse_list(args.density, float),
+        "seed": args.seed,
+        "crews": crews,
+        "mode": args.mode,
+        "llm_latency": float(os.environ["OFFLINE_LLM_LATENCY"]),
+    }
+    documents = generate_corpus(args.corpus, config["pages"], config["density"], args.seed)
+
+    results = []
+    for doc in documents:
+        print(f"{doc['name']} ({doc['pages']} pages, {doc['bytes']:,} bytes)")
+        results.extend(bench_document(doc, workdir, args.repeat, crews, args.mode))
+
+    previous = load_previous(args.history, config)
+    regressions = find_regressions(results, previous, args.threshold)
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+        "regressions": regressions,
+    }
+    os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    if previous is None:
+        print(f"No earlier run with this configuration in {args.history}")
+    for regression in regressions:
+        print(f"REGRESSION {regression['document']} {regression['benchmark']} {regression['metric']}: "
+              f"{regression['before']} -> {regression['after']} ({regression['change']:+.0%})")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Synthetic financial-PDF corpus for the benchmarks.
+
+Documents are written with a minimal PDF writer (Helvetica text and ruled
+table grids), so pdfplumber sees real text and real tables without any
+fixtures checked in. Output is a pure function of (pages, table_density, seed).
+
+    python -m benchmarks.corpus --out benchmarks/corpus --pages 5,40,200 --density 0,0.3
+"""
+import argparse
+import os
+import random
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LINES_PER_PAGE = 45
+
+STATEMENT_TITLES = [
+    "Consolidated Statements of Operations (in millions)",
+    "Consolidated Balance Sheets (in millions)",
+    "Consolidated Statements of Cash Flows (in millions)",
+]
+STATEMENT_ROWS = {
+    "Consolidated Statements of Operations (in millions)": [
+        ("Total revenues", 1.0), ("Cost of revenues", 0.62), ("Gross profit", 0.38),
+        ("Income from operations", 0.12), ("Net income", 0.09),
+    ],
+    "Consolidated Balance Sheets (in millions)": [
+        ("Total assets", 2.4), ("Total liabilities", 1.3), ("Total stockholders' equity", 1.1),
+    ],
+    "Consolidated Statements of Cash Flows (in millions)": [
+        ("Net income", 0.09), ("Net cash provided by operating activities", 0.14),
+        ("Capital expenditures", -0.05),
+    ],
+}
+SENTENCES = [
+    "Revenue for Q{q} {year} was ${amount} million, up {pct}% year over year.",
+    "Gross margin was {pct}% compared with {pct2}% in the prior year period.",
+    "Operating expenses increased {pct}% to ${amount} million driven by R&D spend.",
+    "Net loss from discontinued operations was $({amount}) million in fiscal {year}.",
+    "Free cash flow reached ${amount} million, reflecting lower capital expenditures.",
+    "Market risk and credit risk exposure rose amid interest rate volatility.",
+    "Management sees uncertainty in demand and a possible decline in pricing.",
+    "Total assets and liabilities are presented in the balance sheet on page {page}.",
+    "The income statement and cash flow summary reflect {pct}% equity growth.",
+    "Operational risk remains moderate; foreign exchange exposure is hedged.",
+    "Deferred revenue grew to ${amount} million as of December 31, {year}.",
+    "The deficit in working capital narrowed by ${amount} million during Q{q}.",
+]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_ops(lines, x: int = 50, y: int = 750, leading: int = 15) -> list:
+    ops = [f"BT /F1 10 Tf {leading} TL {x} {y} Td"]
+    ops.extend(f"({_escape(line)}) Tj T*" for line in lines)
+    ops.append("ET")
+    return ops
+
+
+def _table_ops(rows, x: int = 50, y: int = 640, label_width: int = 198, col_width: int = 110,
+               row_height: int = 20) -> list:
+    ops = []
+    for r, row in enumerate(rows):
+        top = y - r * row_height
+        for c, cell in enumerate(row):
+            left = x if c == 0 else x + label_width + (c - 1) * col_width
+            width = label_width if c == 0 else col_width
+            ops.append(f"{left} {top} {width} {row_height} re S")
+            ops.append(f"BT /F1 9 Tf {left + 4} {top + 6} Td ({_escape(cell)}) Tj ET")
+    return ops
+
+
+def build_pdf(page_streams) -> bytes:
+    """
+    Assemble a PDF from per-page content stream operators.
+    """
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for ops in page_streams:
+        stream = "\n".join(ops).encode("latin-1")
+        page_id, content_id = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+# ------------------------
+# Synthetic report content
+# ------------------------
+def _narrative_page(rng: random.Random, page_num: int, year: int) -> list:
+    lines = [f"Management Discussion and Analysis - page {page_num}", ""]
+    while len(lines) < LINES_PER_PAGE:
+        template = rng.choice(SENTENCES)
+        lines.append(template.format(
+            q=rng.randint(1, 4),
+            year=rng.choice([year, year - 1]),
+            amount=f"{rng.uniform(5, 9000):,.1f}",
+            pct=rng.randint(1, 60),
+            pct2=rng.randint(1, 60),
+            page=rng.randint(1, 200),
+        ))
+    return _text_ops(lines)
+
+
+def _statement_page(rng: random.Random, page_num: int, year: int) -> list:
+    title = rng.choice(STATEMENT_TITLES)
+    base = rng.uniform(2_000, 90_000)
+    rows = [["", str(year), str(year - 1), str(year - 2)]]
+    for label, ratio in STATEMENT_ROWS[title]:
+        values = [base * ratio * (1 - 0.08 * i) * rng.uniform(0.95, 1.05) for i in range(3)]
+        rows.append([label] + [f"({abs(v):,.0f})" if v < 0 else f"{v:,.0f}" for v in values])
+
+    notes = [
+        f"{title} - page {page_num}",
+        "Amounts in millions, except per share data. See accompanying notes.",
+    ]
+    return _text_ops(notes, y=750) + _table_ops(rows)
+
+
+def synthetic_report(pages: int, table_density: float = 0.2, seed: int = 0) -> bytes:
+    """
+    A financial report of `pages` pages; each page is a statement table with
+    probability table_density, otherwise narrative text with figures and
+    keywords the tools look for.
+    """
+    rng = random.Random(f"{pages}:{table_density}:{seed}")
+    year = 2020 + rng.randint(0, 5)
+    streams = [
+        _statement_page(rng, n, year) if rng.random() < table_density else _narrative_page(rng, n, year)
+        for n in range(1, pages + 1)
+    ]
+    return build_pdf(streams)
+
+
+def corpus_name(pages: int, table_density: float, seed: int = 0) -> str:
+    return f"report_p{pages}_t{int(table_density * 100):03d}_s{seed}.pdf"
+
+
+def generate_corpus(out_dir: str, page_counts=(5, 40, 200), table_densities=(0.0, 0.3), seed: int = 0) -> list:
+    """
+    Write one report per (page count, table density) into out_dir and return
+    their descriptions. Existing files are reused.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    documents = []
+    for pages in page_counts:
+        for density in table_densities:
+            path = os.path.join(out_dir, corpus_name(pages, density, seed))
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(synthetic_report(pages, density, seed))
+            documents.append({
+                "name": os.path.basename(path),
+                "path": path,
+                "pages": pages,
+                "table_density": density,
+                "bytes": os.path.getsize(path),
+            })
+    return documents
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--pages", default="5,40,200")
+    parser.add_argument("--density", default="0,0.3")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for doc in generate_corpus(args.out, parse_list(args.pages, int), parse_list(args.density, float), args.seed):
+        print(f"{doc['path']}: {doc['pages']} pages, {doc['bytes']:,} bytes")
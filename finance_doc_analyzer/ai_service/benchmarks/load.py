@@ -0,0 +1,249 @@
+"""
+End-to-end load harness for main.py, reproducing the backend's fan-out: every
+user action POSTs the same document to /analyze, /investment, /risk and
+/verify concurrently, then polls /result/{task_id} until done or timed out.
+
+Requests go through the ASGI app in-process, tasks run on an in-process
+Celery worker, and the LLM is the offline stand-in. Without --redis-url a
+fakeredis TCP server stands in for Redis (broker, result backend and caches).
+
+    python -m benchmarks.load --users 1,4,8 --actions 16 --mix 5:0.6,40:0.3,200:0.1
+
+For each concurrency level it reports, per endpoint, submit latency, queue
+wait (submit -> task start), execution time and completion time
+(submit -> result) at p50/p95/p99, so worker sizing and the point where
+queue wait starts to dominate are visible.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from benchmarks.corpus import generate_corpus, parse_list
+
+ENDPOINTS = ["analyze", "investment", "risk", "verify"]
+# The backend gives each of the four requests this long
+REQUEST_TIMEOUT = 300.0
+
+
+def percentile(values, p: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+# ------------------------
+# In-process infrastructure
+# ------------------------
+def start_fake_redis() -> str:
+    """
+    Serve fakeredis over TCP so every client (broker, result backend, caches,
+    pub/sub) talks the real protocol from its own thread. In-process fakeredis
+    clients can deadlock when a finalizer re-enters the server lock.
+    """
+    import socket
+    from fakeredis import TcpFakeServer
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = TcpFakeServer(("127.0.0.1", port))
+    # Connection threads must not keep the harness alive at exit
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def configure_environment(args, workdir: str):
+    """
+    Settings are read at import time, so this runs before any service module loads.
+    """
+    os.environ.setdefault("LLM_BACKEND", "offline")
+    os.environ.setdefault("OFFLINE_LLM_LATENCY", str(args.llm_latency))
+    os.environ.setdefault("WORKER_METRICS_PORT", "0")
+    os.environ["DOCUMENT_STORE_DIR"] = os.path.join(workdir, "store")
+    os.environ["DOCUMENT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["REPORT_ARCHIVE_PATH"] = os.path.join(workdir, "archive", "reports.sqlite3")
+    os.environ["REDIS_URL"] = args.redis_url or start_fake_redis()
+
+
+class TaskTimings:
+    """
+    Start and finish times of every task the in-process worker runs.
+    """
+
+    def __init__(self):
+        self.started = {}
+        self.finished = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        from celery.signals import task_postrun, task_prerun
+
+        @task_prerun.connect(weak=False)
+        def on_start(task_id=None, **kwargs):
+            with self.lock:
+                self.started.setdefault(task_id, time.time())
+
+        @task_postrun.connect(weak=False)
+        def on_finish(task_id=None, **kwargs):
+            with self.lock:
+                self.finished[task_id] = time.time()
+
+
+# ------------------------
+# Load generation
+# ------------------------
+async def run_request(client, endpoint: str, document: dict, no_cache: bool, poll: float) -> dict:
+    sample = {"endpoint": endpoint, "document": document["name"], "pages": document["pages"]}
+    submitted = time.time()
+    with open(document["path"], "rb") as f:
+        files = {"file": (document["name"], f.read(), "application/pdf")}
+    response = await client.post(f"/{endpoint}", files=files, data={"no_cache": str(no_cache).lower()})
+    sample["submit_s"] = time.time() - submitted
+    sample["submitted_at"] = submitted
+    if response.status_code != 200:
+        sample["error"] = f"HTTP {response.status_code}"
+        return sample
+
+    task_id = response.json()["task_id"]
+    sample["task_id"] = task_id
+    while time.time() - submitted < REQUEST_TIMEOUT:
+        status = (await client.get(f"/result/{task_id}")).json()
+        if status["status"] == "success":
+            sample["completion_s"] = time.time() - submitted
+            if (status.get("result") or {}).get("error"):
+                sample["error"] = status["result"]["error"]
+            return sample
+        if status["status"] == "failed":
+            sample["error"] = status.get("error")
+            return sample
+        await asyncio.sleep(poll)
+    sample["error"] = "timeout"
+    return sample
+
+
+async def run_level(app, users: int, actions: int, documents: list, weights: list, args) -> list:
+    import httpx
+
+    rng = random.Random(args.seed)
+    plan = rng.choices(documents, weights=weights, k=actions)
+    queue = asyncio.Queue()
+    for document in plan:
+        queue.put_nowait(document)
+    samples = []
+
+    async def user(client):
+        while not queue.empty():
+            document = queue.get_nowait()
+            # One user action: the four analysis requests at once
+            samples.extend(await asyncio.gather(*(
+                run_request(client, endpoint, document, not args.cache, args.poll)
+                for endpoint in ENDPOINTS
+            )))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=REQUEST_TIMEOUT) as client:
+        await asyncio.gather(*(user(client) for _ in range(users)))
+    return samples
+
+
+def summarize(samples: list, timings: TaskTimings, users: int, wall_s: float) -> dict:
+    for sample in samples:
+        task_id = sample.get("task_id")
+        started = timings.started.get(task_id)
+        finished = timings.finished.get(task_id)
+        if started:
+            sample["queue_wait_s"] = max(0.0, started - sample["submitted_at"])
+        if started and finished:
+            sample["exec_s"] = finished - started
+
+    report = {"users": users, "requests": len(samples), "wall_s": round(wall_s, 2),
+              "actions_per_min": round(len(samples) / len(ENDPOINTS) / wall_s * 60, 2),
+              "endpoints": {}}
+    for endpoint in ENDPOINTS:
+        rows = [s for s in samples if s["endpoint"] == endpoint]
+        entry = {
+            "count": len(rows),
+            "errors": sum(1 for s in rows if s.get("error") and s["error"] != "timeout"),
+            "timeouts": sum(1 for s in rows if s.get("error") == "timeout"),
+        }
+        for metric in ("submit_s", "queue_wait_s", "exec_s", "completion_s"):
+            values = [s[metric] for s in rows if metric in s]
+            entry[metric] = {f"p{p}": round(percentile(values, p), 3) if values else None
+                             for p in (50, 95, 99)}
+        report["endpoints"][endpoint] = entry
+    return report
+
+
+def print_report(report: dict):
+    print(f"\nusers={report['users']}  requests={report['requests']}  wall={report['wall_s']}s  "
+          f"actions/min={report['actions_per_min']}")
+    print(f"  {'endpoint':<11}{'n':>4}{'err':>5}{'t/o':>5}   "
+          f"{'submit p50/p95/p99':>22}   {'queue wait p50/p95/p99':>26}   "
+          f"{'exec p50/p95/p99':>22}   {'completion p50/p95/p99':>26}")
+
+    def fmt(stats):
+        return "/".join("-" if v is None else f"{v:.2f}" for v in stats.values())
+
+    for endpoint, entry in report["endpoints"].items():
+        print(f"  {endpoint:<11}{entry['count']:>4}{entry['errors']:>5}{entry['timeouts']:>5}   "
+              f"{fmt(entry['submit_s']):>22}   {fmt(entry['queue_wait_s']):>26}   "
+              f"{fmt(entry['exec_s']):>22}   {fmt(entry['completion_s']):>26}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the analysis API end to end")
+    parser.add_argument("--users", default="1,4", help="comma-separated concurrency levels")
+    parser.add_argument("--actions", type=int, default=8, help="user actions per level (4 requests each)")
+    parser.add_argument("--mix", default="5:0.7,40:0.3", help="pages:weight document mix")
+    parser.add_argument("--density", type=float, default=0.3, help="table density of the documents")
+    parser.add_argument("--worker-concurrency", type=int, default=4)
+    parser.add_argument("--worker-pool", default="threads")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="offline LLM seconds per call")
+    parser.add_argument("--poll", type=float, default=0.25, help="seconds between /result polls")
+    parser.add_argument("--cache", action="store_true", help="allow LLM result cache hits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--redis-url", default=None, help="real Redis for broker and backend")
+    parser.add_argument("--output", default=None, help="write the reports as JSON here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fda-load-")
+    configure_environment(args, workdir)
+
+    from celery.contrib.testing.worker import start_worker
+    from celery_app import celery_app
+    import main as api
+
+    mix = [item.split(":") for item in parse_list(args.mix, str)]
+    pages = [int(p) for p, _ in mix]
+    weights = [float(w) for _, w in mix]
+    documents = generate_corpus(args.corpus, pages, [args.density], args.seed)
+
+    timings = TaskTimings()
+    timings.connect()
+    reports = []
+    with start_worker(celery_app, pool=args.worker_pool, concurrency=args.worker_concurrency,
+                      perform_ping_check=False, loglevel="WARNING"):
+        for users in parse_list(args.users, int):
+            started = time.time()
+            samples = asyncio.run(run_level(api.app, users, args.actions, documents, weights, args))
+            report = summarize(samples, timings, users, time.time() - started)
+            print_report(report)
+            reports.append(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "reports": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 import os
 from dotenv import load_dotenv
 
@@ -7,12 +8,52 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Results stay in Redis this long (compressed, see result_backend.py);
+# finished reports are kept for good in the report archive
+RESULT_TTL = int(os.getenv("RESULT_TTL", str(24 * 3600)))
+# A worker whose resident memory stays above this after a task is replaced
+# (see worker_memory.py); 0 never recycles
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "2048"))
+
+# ------------------------
+# Queues
+# ------------------------
+# The API routes each task by the work it implies (see routing.py); every
+# queue has its own workers, so a long filing never waits in front of a
+# one-page verification
+FAST_QUEUE = "fast"
+STANDARD_QUEUE = "standard"
+BULK_QUEUE = "bulk"
+TASK_QUEUES = (FAST_QUEUE, STANDARD_QUEUE, BULK_QUEUE)
+# Redis keeps one list per priority level and serves level 0 first
+PRIORITY_LEVELS = 10
+DEFAULT_PRIORITY = 5
+PRIORITY_SEP = ":"
+# Seconds before the Redis transport redelivers a message a worker took but
+# has not acknowledged, including countdown (ETA) messages it holds in memory
+BROKER_VISIBILITY_TIMEOUT = int(os.getenv("BROKER_VISIBILITY_TIMEOUT", "3600"))
+# Longest countdown a quota retry may wait (see celery_tasks.defer_for_quota);
+# kept well below the visibility timeout so held retries are never redelivered
+QUOTA_RETRY_MAX_COUNTDOWN = min(
+    float(os.getenv("QUOTA_RETRY_MAX_COUNTDOWN", "300")), BROKER_VISIBILITY_TIMEOUT / 2
+)
+# Periodically promotes tasks that waited too long at a low priority
+AGE_QUEUES_TASK = "celery_tasks.age_queued_tasks"
+QUEUE_AGING_INTERVAL = float(os.getenv("QUEUE_AGING_INTERVAL", "15"))
+
+
+def priority_list(queue: str, priority: int) -> str:
+    """
+    Redis list holding the messages of queue at a priority level.
+    """
+    return f"{queue}{PRIORITY_SEP}{priority}" if priority else queue
+
 
 # Initialize Celery app
 celery_app = Celery(
     "financial_analyzer",
     broker=REDIS_URL,
-    backend=REDIS_URL,
+    backend=f"result_backend:CompressedRedisBackend+{REDIS_URL}",
     include=[
         "celery_tasks"  # This should be the module where your Celery tasks are defined
     ]
@@ -26,7 +67,25 @@ celery_app.conf.update(
     timezone="Asia/Kolkata",
     enable_utc=True,
     worker_prefetch_multiplier=1,  # better for parallel large tasks
-    task_acks_late=True
+    task_acks_late=True,
+    result_expires=RESULT_TTL,
+    # Prefork: the pool replaces a child once it exceeds this (KiB)
+    worker_max_memory_per_child=WORKER_MAX_RSS_MB * 1024 or None,
+    task_queues=[Queue(name) for name in TASK_QUEUES],
+    task_default_queue=STANDARD_QUEUE,
+    task_default_priority=DEFAULT_PRIORITY,
+    broker_transport_options={
+        "priority_steps": list(range(PRIORITY_LEVELS)),
+        "sep": PRIORITY_SEP,
+        "visibility_timeout": BROKER_VISIBILITY_TIMEOUT,
+    },
+    beat_schedule={
+        "age-queued-tasks": {
+            "task": AGE_QUEUES_TASK,
+            "schedule": QUEUE_AGING_INTERVAL,
+            "options": {"queue": FAST_QUEUE, "priority": 0, "expires": QUEUE_AGING_INTERVAL},
+        },
+    }
 )
 
 if __name__ == "__main__":
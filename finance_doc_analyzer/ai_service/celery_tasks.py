@@ -1,37 +1,149 @@
-from celery_app import celery_app
-from task import analyze_financial_document, investment_analysis, risk_assessment, verification
+from celery_app import AGE_QUEUES_TASK, QUOTA_RETRY_MAX_COUNTDOWN, celery_app
 from crewai import Crew, Process
-from agents import financial_analyst, investment_advisor, risk_assessor, verifier
+from celery.concurrency import get_implementation
+from celery.signals import (
+    task_failure, task_postrun, task_prerun, task_success, worker_init, worker_process_init
+)
+from celery.worker.control import inspect_command
+from crewai.utilities.events import (
+    crewai_event_bus, LLMCallCompletedEvent, LLMCallStartedEvent, ToolUsageFinishedEvent
+)
+from document_cache import cache_stats, get_pages
+from document_store import document_handle
+from keyword_scan import scan_document
+from numeric_facts import get_fact_table
+from tables import get_tables
+from retrieval import get_chunk_index
+from routing import age_queues, resolve_mode, use_map_reduce
+from summaries import format_summaries, get_section_summaries
+from worker_memory import heavy_tasks
+from llm_cache import (
+    cache_key, get_cached_result, normalize_query, refresh_inflight, release_inflight, store_result
+)
+from report_archive import report_archive
+from rate_limiter import QuotaUnavailable, estimate_requests, rate_limiter
+from task_client import (
+    AGGREGATE_RESULTS_TASK, ANALYZE_TASK, INVESTMENT_TASK, MODE_AUTO, MODE_MAP_REDUCE, PREPARE_DOCUMENT_TASK,
+    RISK_TASK, VERIFY_TASK
+)
+import crews
+import metrics
+import progress
 import logging
 
 logger = logging.getLogger(__name__)
 
-def run_crew_bytes(query, filename, file_bytes, agent, task):
+def run_crew(query, filename, digest, task_type, task_name, task_id=None, use_cache=True, mode=MODE_AUTO):
     """
-    Kick off a Crew task and return JSON-serializable result using file bytes.
+    Kick off a Crew task and return JSON-serializable result for a stored document.
+    Results are cached per (document, task, query, mode, model settings);
+    use_cache=False skips the lookup but still refreshes the cache. In
+    map-reduce mode the agent gets the document's section summaries, built
+    on first use. Raises QuotaUnavailable when the shared LLM quota cannot
+    cover the run yet.
     """
+    mode = resolve_mode(mode, task_name, digest)
+    key = cache_key(digest, task_name, query, mode)
+    release = True
     try:
-        # Save to temp file for LLM processing
-        temp_path = f"data/{filename}"
-        with open(temp_path, "wb") as f:
-            f.write(file_bytes)
+        if use_cache:
+            cached = get_cached_result(key)
+            metrics.record_cache("llm_result", cached is not None)
+            if cached is not None:
+                logger.info("LLM cache hit for %s (document %s)", task_name, digest)
+                if task_id:
+                    report_archive.link_task(task_id, key)
+                return cached
 
+        # Tools read the stored copy through its handle; nothing is copied to disk
+        document_path = document_handle(digest)
+        inputs = {"query": query, "path": document_path}
+        # Index the document before the crew starts, as prepare_document_task
+        # does for /analyze-all, so searches are lookups and extraction never
+        # runs while the LLM quota is reserved. Verification reads pages
+        # lazily and indexes only if its agent searches.
+        if task_type != "verify":
+            try:
+                get_chunk_index(document_path, digest)
+            except Exception:
+                # The tools report an unreadable document to the agent
+                logger.warning("Could not index document %s", digest, exc_info=True)
+        map_reduce = mode == MODE_MAP_REDUCE
+        agent, task = crews.checkout(task_type, map_reduce)
+        if map_reduce:
+            summaries = get_section_summaries(document_path, digest, agent.llm)
+            inputs["summaries"] = format_summaries(summaries)
+
+        # Reserve quota up front so the crew never stalls on provider limits
+        reservation = rate_limiter.reserve(estimate_requests(agent))
+
+        logger.info("Running crew for %s (document %s)", filename, digest)
+        progress.publish("crew_started", task_name=task_name, map_reduce=map_reduce)
+
+        # No crew memory: every run starts from its own copies of the agents,
+        # and nothing a run learns is kept in the worker for the next one
         crew = Crew(
             agents=[agent],
             tasks=[task],
-            process=Process.sequential
+            process=Process.sequential,
+            memory=False
         )
-        result = crew.kickoff(inputs={"query": query, "path": temp_path})
+        try:
+            with metrics.task_stage("crew"):
+                result = crew.kickoff(inputs=inputs)
+        finally:
+            usage = crew.usage_metrics
+            if usage is not None:
+                rate_limiter.reconcile(reservation, usage.successful_requests, usage.total_tokens)
+                metrics.record_tokens(usage.prompt_tokens, usage.completion_tokens)
 
         serialized = serialize_crew_output(result)
         if not serialized.get("text"):
             logger.warning("LLM returned empty response")
             return {"text": None, "metadata": None, "error": "LLM returned empty response"}
-        
+
+        store_result(key, serialized)
+        report_archive.store(key, digest, task_name, query, normalize_query(query), mode, serialized, task_id)
         return serialized
+    except QuotaUnavailable as e:
+        # The task goes back to the queue and keeps its in-flight claim for
+        # the countdown and the run after it
+        release = False
+        if task_id:
+            refresh_inflight(key, task_id, quota_countdown(e))
+        raise
     except Exception as e:
         logger.exception("Crew task failed")
         return {"text": None, "metadata": None, "error": str(e)}
+    finally:
+        if task_id and release:
+            release_inflight(key, task_id)
+
+def quota_countdown(e) -> float:
+    return min(e.retry_after, QUOTA_RETRY_MAX_COUNTDOWN)
+
+def defer_for_quota(celery_task, e):
+    """
+    Requeue the task with a countdown when LLM quota is exhausted rather than
+    sleeping in the worker. On Redis the retry is an ETA message held by a
+    worker, not a queued one, so the countdown is capped below the broker's
+    visibility timeout; a task deferred for longer simply checks the quota
+    again and defers once more.
+    """
+    countdown = quota_countdown(e)
+    logger.info("Deferring %s for %.1fs: %s", celery_task.request.id, countdown, e)
+    progress.publish("waiting_for_quota", retry_after=countdown)
+    return celery_task.retry(countdown=countdown, max_retries=None)
+
+def run_crew_task(celery_task, query, filename, digest, task_type, use_cache=True, mode=MODE_AUTO):
+    """
+    Body shared by the crew tasks: run the crew, deferring on exhausted quota.
+    """
+    try:
+        return run_crew(query, filename, digest, task_type,
+                        celery_task.name, celery_task.request.id, use_cache, mode)
+    except QuotaUnavailable as e:
+        raise defer_for_quota(celery_task, e)
 
 def serialize_crew_output(output):
     if hasattr(output, "text") or hasattr(output, "metadata"):
@@ -41,19 +153,106 @@ def serialize_crew_output(output):
         }
     return {"text": str(output), "metadata": None}
 
-# Celery tasks
-@celery_app.task(bind=True)
-def analyze_financial_document_task(self, query, filename, file_bytes):
-    return run_crew_bytes(query, filename, file_bytes, financial_analyst, analyze_financial_document)
+# Progress events: GET /stream/{task_id} relays these to clients
+@task_prerun.connect
+def _progress_task_started(task_id=None, task=None, **kwargs):
+    progress.begin_task(task_id)
+    progress.publish("started", task_name=task.name)
+
+@task_postrun.connect
+def _progress_task_done(**kwargs):
+    progress.end_task()
+
+@task_success.connect
+def _progress_task_succeeded(sender=None, result=None, **kwargs):
+    progress.publish("result", task_id=sender.request.id, status="success", result=result)
+
+@task_failure.connect
+def _progress_task_failed(task_id=None, exception=None, **kwargs):
+    progress.publish("failed", task_id=task_id, status="failed", error=str(exception))
 
-@celery_app.task(bind=True)
-def investment_analysis_task(self, query, filename, file_bytes):
-    return run_crew_bytes(query, filename, file_bytes, investment_advisor, investment_analysis)
+# Handlers run synchronously in the thread driving the crew
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _progress_llm_call(source, event):
+    progress.llm_call_completed(call_type=str(event.call_type))
+
+# Stage timings: each agent iteration is one LLM call plus any tool it picks
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _metrics_llm_call_started(source, event):
+    metrics.llm_call_started()
+
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _metrics_llm_call_completed(source, event):
+    metrics.llm_call_completed()
+
+@crewai_event_bus.on(ToolUsageFinishedEvent)
+def _metrics_tool_used(source, event):
+    metrics.observe_task_stage("tool", (event.finished_at - event.started_at).total_seconds())
+
+# Build the agents before the worker takes tasks. Prefork children build their
+# own after the fork, so no LLM client is shared across it; thread, gevent and
+# eventlet pools run tasks in the worker process itself.
+@worker_process_init.connect
+def _warm_up_pool_process(**kwargs):
+    crews.warm_up()
+
+@worker_init.connect
+def _warm_up_worker(sender=None, **kwargs):
+    if get_implementation(sender.pool_cls).__module__ != "celery.concurrency.prefork":
+        crews.warm_up()
+
+# Worker inspection: celery -A celery_app.celery_app inspect document_cache_stats
+@inspect_command()
+def document_cache_stats(state):
+    return cache_stats()
+
+# celery -A celery_app.celery_app inspect task_memory_stats
+@inspect_command()
+def task_memory_stats(state):
+    return {"heaviest_tasks": heavy_tasks()}
+
+# Celery tasks (the API enqueues them by the names in task_client.py)
+@celery_app.task(bind=True, name=ANALYZE_TASK)
+def analyze_financial_document_task(self, query, filename, digest, use_cache=True, mode=MODE_AUTO):
+    return run_crew_task(self, query, filename, digest, "analyze", use_cache, mode)
+
+@celery_app.task(bind=True, name=INVESTMENT_TASK)
+def investment_analysis_task(self, query, filename, digest, use_cache=True, mode=MODE_AUTO):
+    return run_crew_task(self, query, filename, digest, "investment", use_cache, mode)
+
+@celery_app.task(bind=True, name=RISK_TASK)
+def risk_assessment_task(self, query, filename, digest, use_cache=True, mode=MODE_AUTO):
+    return run_crew_task(self, query, filename, digest, "risk", use_cache, mode)
+
+@celery_app.task(bind=True, name=VERIFY_TASK)
+def verification_task(self, query, filename, digest, use_cache=True, mode=MODE_AUTO):
+    return run_crew_task(self, query, filename, digest, "verify", use_cache, mode)
+
+@celery_app.task(bind=True, name=PREPARE_DOCUMENT_TASK)
+def prepare_document_task(self, digest, mode=MODE_AUTO):
+    """
+    Extract the document once into the shared cache before the crews fan out,
+    and summarize its sections when the crews will run in map-reduce mode.
+    """
+    path = document_handle(digest)
+    pages = get_pages(path, digest)
+    get_chunk_index(path, digest)
+    scan_document(path, digest)
+    get_fact_table(path, digest)
+    get_tables(path, digest)
+    summarized = use_map_reduce(mode, digest)
+    if summarized:
+        try:
+            get_section_summaries(path, digest, crews.shared_llm())
+        except QuotaUnavailable as e:
+            raise defer_for_quota(self, e)
+    return {"digest": digest, "pages": len(pages), "summarized": summarized}
 
-@celery_app.task(bind=True)
-def risk_assessment_task(self, query, filename, file_bytes):
-    return run_crew_bytes(query, filename, file_bytes, risk_assessor, risk_assessment)
+@celery_app.task(bind=True, name=AGGREGATE_RESULTS_TASK)
+def aggregate_results_task(self, results, task_types):
+    return dict(zip(task_types, results))
 
-@celery_app.task(bind=True)
-def verification_task(self, query, filename, file_bytes):
-    return run_crew_bytes(query, filename, file_bytes, verifier, verification)
+# Scheduled by celery beat (celery_app.py)
+@celery_app.task(name=AGE_QUEUES_TASK, ignore_result=True)
+def age_queued_tasks():
+    return age_queues()
@@ -0,0 +1,68 @@
+import logging
+import threading
+from agents import build_agents
+from task import (
+    analyze_financial_document, analyze_financial_document_map_reduce, investment_analysis,
+    risk_assessment, risk_assessment_map_reduce, verification
+)
+
+logger = logging.getLogger(__name__)
+
+# Analysis type -> (agent from build_agents(), task template from task.py)
+CREWS = {
+    "analyze": ("financial_analyst", analyze_financial_document),
+    "investment": ("investment_advisor", investment_analysis),
+    "risk": ("risk_assessor", risk_assessment),
+    "verify": ("verifier", verification),
+}
+# Map-reduce variants: the task prompt carries the section summaries
+MAP_REDUCE_CREWS = {
+    "analyze": ("financial_analyst", analyze_financial_document_map_reduce),
+    "risk": ("risk_assessor", risk_assessment_map_reduce),
+}
+
+_templates = None
+_templates_lock = threading.Lock()
+
+
+def warm_up() -> dict:
+    """
+    Build the LLM client and agents and bind the task templates to them, once
+    per process. Workers call this before taking tasks so the first request
+    does not pay for it. Returns {(analysis type, map_reduce): (agent, task)}
+    templates.
+    """
+    global _templates
+    with _templates_lock:
+        if _templates is None:
+            agents = build_agents()
+            templates = {}
+            for map_reduce, crews in ((False, CREWS), (True, MAP_REDUCE_CREWS)):
+                for task_type, (agent_name, template) in crews.items():
+                    agent = agents[agent_name]
+                    task = template.copy(agents=[agent], task_mapping={})
+                    task.agent = agent
+                    templates[(task_type, map_reduce)] = (agent, task)
+            _templates = templates
+            logger.info("Built agents for %s", ", ".join(CREWS))
+    return _templates
+
+
+def shared_llm():
+    """
+    The LLM client behind the agents, for calls made outside a crew.
+    """
+    agent, _ = warm_up()[("analyze", False)]
+    return agent.llm
+
+
+def checkout(task_type: str, map_reduce: bool = False) -> tuple:
+    """
+    A fresh (agent, task) pair for one crew run, copied from the templates.
+    Agents carry per-run state (executor, token counts, RPM controller), so
+    runs sharing a process under the thread or gevent pool must not share them.
+    """
+    agent_template, task_template = warm_up()[(task_type, map_reduce)]
+    agent = agent_template.copy()
+    task = task_template.copy(agents=[agent], task_mapping={})
+    return agent, task
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from dotenv import load_dotenv
+from document_store import handle_digest, is_digest
+from extraction import extract_pages, iter_pages as extract_iter_pages
+from metrics import record_cache, task_stage
+from progress import extraction_progress
+from scratch import DOCUMENT_CACHE_DIR, scratch_area
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+MEMORY_CACHE_BYTES = int(os.getenv("DOCUMENT_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+ARTIFACT_CACHE_ENTRIES = int(os.getenv("DOCUMENT_ARTIFACT_CACHE_ENTRIES", "64"))
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# Document identity
+# ------------------------
+_path_digests = {}
+_path_digests_lock = threading.Lock()
+
+
+def digest_for_path(path: str) -> str:
+    """
+    Return the content digest of the document at path (or doc:// handle).
+    Files from the document store are named by digest; anything else is
+    hashed once per (path, size, mtime).
+    """
+    digest = handle_digest(path)
+    if digest is not None:
+        return digest
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if is_digest(stem):
+        return stem
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _path_digests_lock:
+        if key in _path_digests:
+            return _path_digests[key]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _path_digests_lock:
+        _path_digests[key] = digest
+    return digest
+
+
+def document_dir(digest: str) -> str:
+    """
+    Directory holding the cached extraction (and derived artifacts) of a
+    document: its entry in the quota-bounded scratch area.
+    """
+    return scratch_area.entry_dir(digest)
+
+
+def artifact_path(digest: str, name: str) -> str:
+    """
+    Path of a derived artifact (index, scans, tables) stored next to the extraction.
+    """
+    return os.path.join(document_dir(digest), name)
+
+
+def _write_atomic(path: str, data: bytes):
+    _write_atomic_with(path, lambda f: f.write(data))
+
+
+def _write_atomic_with(path: str, writer):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ------------------------
+# Derived artifacts
+# ------------------------
+class ArtifactCache:
+    """
+    Derived per-document artifacts (indexes, scans, tables) persisted next to
+    the extraction, with a small in-process LRU in front of the disk copy.
+    """
+
+    def __init__(self, max_entries: int = ARTIFACT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, digest: str, name: str, load, build, dump):
+        """
+        Return artifact name for digest: from memory, else load(path) from disk,
+        else build() it and persist it with dump(value, file).
+        """
+        key = (digest, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                record_cache("artifact", True)
+                return self._entries[key]
+
+        path = artifact_path(digest, name)
+        value = None
+        if os.path.exists(path):
+            try:
+                value = load(path)
+                scratch_area.touch(digest)
+            except Exception:
+                logger.warning("Rebuilding unreadable artifact %s", path)
+        record_cache("artifact", value is not None)
+        if value is None:
+            value = build()
+            _write_atomic_with(path, lambda f: dump(value, f))
+            scratch_area.record_write(digest, os.path.getsize(path))
+
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+artifact_cache = ArtifactCache()
+
+
+# ------------------------
+# Two-tier page cache
+# ------------------------
+class PageCache:
+    """
+    Per-page document text keyed by content digest: an in-process LRU bounded
+    by total text size, backed by an on-disk store shared by all workers.
+    """
+
+    def __init__(self, root: str = DOCUMENT_CACHE_DIR, max_bytes: int = MEMORY_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _pages_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest, "pages.json")
+
+    def _remember(self, digest: str, pages: list):
+        size = sum(len(p) for p in pages)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return
+            self._entries[digest] = (pages, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _lookup_memory(self, digest: str):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            self.memory_hits += 1
+            return entry[0]
+
+    def _lookup_disk(self, digest: str):
+        pages_path = self._pages_path(digest)
+        if not os.path.exists(pages_path):
+            return None
+        try:
+            with open(pages_path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Discarding unreadable cache entry %s", pages_path)
+            return None
+        scratch_area.touch(digest)
+        with self._lock:
+            self.disk_hits += 1
+        return pages
+
+    def get_pages(self, path: str, digest: str = None) -> list:
+        """
+        Return the per-page text of the document at path, extracting it only
+        if neither cache tier has it.
+        """
+        digest = digest or digest_for_path(path)
+
+        pages = self._lookup_memory(digest)
+        if pages is not None:
+            record_cache("pages", True)
+            return pages
+
+        pages = self._lookup_disk(digest)
+        record_cache("pages", pages is not None)
+        if pages is None:
+            with self._lock:
+                self.misses += 1
+            with task_stage("extraction"):
+                pages = extract_pages(path, on_progress=extraction_progress)
+            self._store(digest, pages)
+
+        self._remember(digest, pages)
+        return pages
+
+    def has_pages(self, digest: str) -> bool:
+        """
+        Whether either cache tier already holds the document's page text.
+        """
+        with self._lock:
+            if digest in self._entries:
+                return True
+        return os.path.exists(self._pages_path(digest))
+
+    def iter_pages(self, path: str, digest: str = None):
+        """
+        Yield the per-page text of the document at path, from the cache when
+        it has the document and otherwise extracting one page at a time as
+        the consumer advances. An extraction that runs to the last page is
+        cached like get_pages(); one abandoned early is not.
+        """
+        digest = digest or digest_for_path(path)
+
+        pages = self._lookup_memory(digest)
+        if pages is None:
+            pages = self._lookup_disk(digest)
+            if pages is not None:
+                self._remember(digest, pages)
+        record_cache("pages", pages is not None)
+        if pages is not None:
+            yield from pages
+            return
+
+        with self._lock:
+            self.misses += 1
+        pages = []
+        with closing(extract_iter_pages(path)) as texts:
+            for text in texts:
+                pages.append(text)
+                yield text
+        self._store(digest, pages)
+        self._remember(digest, pages)
+
+    def _store(self, digest: str, pages: list):
+        data = json.dumps(pages, ensure_ascii=False).encode("utf-8")
+        _write_atomic(self._pages_path(digest), data)
+        scratch_area.record_write(digest, len(data))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_max_bytes": self.max_bytes,
+            }
+
+
+page_cache = PageCache()
+
+
+def get_pages(path: str, digest: str = None) -> list:
+    return page_cache.get_pages(path, digest)
+
+
+def iter_pages(path: str, digest: str = None):
+    return page_cache.iter_pages(path, digest)
+
+
+def cache_stats() -> dict:
+    return page_cache.stats()
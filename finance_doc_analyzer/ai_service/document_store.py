@@ -0,0 +1,273 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+from scratch import scratch_area
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+DOCUMENT_STORE_BACKEND = os.getenv("DOCUMENT_STORE_BACKEND", "local")
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", os.path.join("data", "store"))
+
+# Agents and tools refer to documents as doc://<digest>, never by path
+DOCUMENT_HANDLE_PREFIX = "doc://"
+
+
+def compute_digest(data: bytes) -> str:
+    """
+    Return the SHA-256 hex digest used as the document key.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_digest(value: str) -> bool:
+    """
+    True if value looks like a SHA-256 hex digest.
+    """
+    return (
+        isinstance(value, str)
+        and len(value) == 64
+        and all(c in "0123456789abcdef" for c in value)
+    )
+
+
+def document_handle(digest: str) -> str:
+    return DOCUMENT_HANDLE_PREFIX + digest
+
+
+def handle_digest(value) -> str:
+    """
+    Digest named by a doc:// handle, or None if value is not a handle.
+    """
+    if isinstance(value, str) and value.startswith(DOCUMENT_HANDLE_PREFIX):
+        digest = value[len(DOCUMENT_HANDLE_PREFIX):]
+        if is_digest(digest):
+            return digest
+    return None
+
+
+# ------------------------
+# Streaming writes
+# ------------------------
+class DocumentWriter:
+    """
+    Receives a document in chunks, hashing as it goes, and stores it under
+    its digest on commit(). Use it as a context manager: leaving the block
+    without committing discards what was written.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self.committed = False
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        self._write(chunk)
+
+    def _write(self, chunk: bytes):
+        self._buffer.write(chunk)
+
+    def commit(self) -> str:
+        """
+        Store the document and return its digest. Returns without writing
+        anything if the store already holds it.
+        """
+        digest = self._hash.hexdigest()
+        if not self.store.exists(digest):
+            self.store.put(self._buffer.getvalue())
+        self.committed = True
+        return digest
+
+    def abort(self):
+        self._buffer = io.BytesIO()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.committed:
+            self.abort()
+
+
+class LocalDocumentWriter(DocumentWriter):
+    """
+    Streams chunks into a temp file next to the store, renamed into place on
+    commit, so the document is never held in memory.
+    """
+
+    def __init__(self, store):
+        super().__init__(store)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.root, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def _write(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        digest = self._hash.hexdigest()
+        self._file.close()
+        path = self.store._path(digest)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        self.committed = True
+        return digest
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+# ------------------------
+# Store interface
+# ------------------------
+class DocumentStore(ABC):
+    """
+    Content-addressed document store. Documents are written once and
+    referenced everywhere else (Celery messages, caches) by their digest.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """
+        Store a document and return its digest; storing it again is a no-op.
+        """
+
+    @abstractmethod
+    def get(self, digest: str) -> bytes:
+        """
+        The whole document.
+        """
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """
+        Whether the store holds the document.
+        """
+
+    def writer(self) -> DocumentWriter:
+        """
+        Writer for a document arriving in chunks (see DocumentWriter).
+        """
+        return DocumentWriter(self)
+
+    def open(self, digest: str):
+        """
+        Readable, seekable binary buffer over the document; close it when done.
+        """
+        return io.BytesIO(self.get(digest))
+
+    def local_path(self, digest: str) -> str:
+        """
+        Return a filesystem path for the document, for libraries that need one.
+        Remote backends spill a copy into the scratch area.
+        """
+        path = os.path.join(scratch_area.entry_dir(digest), "document.pdf")
+        if not os.path.exists(path):
+            data = self.get(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            scratch_area.record_write(digest, len(data))
+        else:
+            scratch_area.touch(digest)
+        return path
+
+
+# ------------------------
+# Local filesystem backend
+# ------------------------
+class LocalDocumentStore(DocumentStore):
+    def __init__(self, root: str = DOCUMENT_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if not is_digest(digest):
+            raise ValueError(f"Invalid document digest: {digest}")
+        # Two-level fan-out keeps directory listings small
+        return os.path.join(self.root, digest[:2], f"{digest}.pdf")
+
+    def put(self, data: bytes) -> str:
+        digest = compute_digest(data)
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial document
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def writer(self) -> DocumentWriter:
+        return LocalDocumentWriter(self)
+
+    def open(self, digest: str):
+        # Memory-mapped: pages come from the OS page cache, shared by every
+        # worker process, and nothing is copied into the Python heap
+        with open(self._path(digest), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def local_path(self, digest: str) -> str:
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Document {digest} not found in store")
+        return path
+
+
+# ------------------------
+# Backend registry
+# ------------------------
+STORE_BACKENDS = {
+    "local": LocalDocumentStore,
+}
+
+_store = None
+
+
+def register_store_backend(name: str, factory):
+    """
+    Register an additional backend, selectable with DOCUMENT_STORE_BACKEND.
+    """
+    STORE_BACKENDS[name] = factory
+
+
+def get_document_store() -> DocumentStore:
+    """
+    Return the process-wide document store for the configured backend.
+    """
+    global _store
+    if _store is None:
+        if DOCUMENT_STORE_BACKEND not in STORE_BACKENDS:
+            raise ValueError(f"Unknown document store backend: {DOCUMENT_STORE_BACKEND}")
+        _store = STORE_BACKENDS[DOCUMENT_STORE_BACKEND]()
+    return _store
@@ -0,0 +1,195 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import pdfplumber
+from dotenv import load_dotenv
+from document_store import get_document_store, handle_digest
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Worker processes for page-sharded extraction (0 = one per core, 1 = never parallel)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or (os.cpu_count() or 1)
+# Documents with fewer pages are extracted in-process
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACTION_MIN_PAGES", "40"))
+# Smallest page range handed to one worker
+EXTRACTION_SHARD_PAGES = int(os.getenv("EXTRACTION_SHARD_PAGES", "8"))
+# forkserver keeps pool start-up safe when the caller runs threads
+EXTRACTION_START_METHOD = os.getenv("EXTRACTION_START_METHOD", "forkserver")
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# Opening documents
+# ------------------------
+@contextmanager
+def open_pdf(source: str, pages=None):
+    """
+    Open a document for pdfplumber. A doc:// handle is read from the store's
+    in-memory buffer (memory-mapped for the local store); anything else is a
+    filesystem path.
+    """
+    digest = handle_digest(source)
+    if digest is None:
+        with pdfplumber.open(source, pages=pages) as pdf:
+            yield pdf
+        return
+
+    with get_document_store().open(digest) as buffer:
+        with pdfplumber.open(buffer, pages=pages) as pdf:
+            yield pdf
+
+
+# ------------------------
+# Page-level PDF text extraction
+# ------------------------
+def extract_page_text(page) -> str:
+    """
+    Extract normalized text for a single pdfplumber page, then release the
+    page's parsed layout objects: pdfplumber otherwise keeps them for every
+    page until the document is closed.
+    """
+    try:
+        content = page.extract_text() or ""
+    finally:
+        page.close()
+    # Replace consecutive newlines with single newline
+    return content.replace("\n\n", "\n")
+
+
+def extract_page_range(source: str, start: int, stop: int) -> list:
+    """
+    Extract pages [start, stop) (0-based). Runs inside pool workers, each of
+    which opens the document itself.
+    """
+    with open_pdf(source, pages=range(start + 1, stop + 1)) as pdf:
+        return [extract_page_text(page) for page in pdf.pages]
+
+
+def shard_pages(page_count: int, workers: int) -> list:
+    """
+    Split page indices into contiguous ranges, a few per worker so that
+    uneven pages balance out.
+    """
+    shard_size = max(EXTRACTION_SHARD_PAGES, -(-page_count // (workers * 4)))
+    return [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+
+# ------------------------
+# Shared process pool
+# ------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context(EXTRACTION_START_METHOD),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# e.g. daemonic Celery prefork children may not start subprocesses
+PARALLEL_ERRORS = (AssertionError, BrokenProcessPool, OSError)
+
+
+def _map_ranges_parallel(range_fn, source: str, page_count: int, on_progress=None) -> list:
+    ranges = shard_pages(page_count, EXTRACTION_WORKERS)
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(range_fn, source, start, stop) for start, stop in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+            if on_progress:
+                on_progress(len(pages), page_count)
+        return pages
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+
+
+def _extract_pages_serial(pdf, on_progress=None) -> list:
+    pages = []
+    for page in pdf.pages:
+        pages.append(extract_page_text(page))
+        if on_progress:
+            on_progress(len(pages), len(pdf.pages))
+    return pages
+
+
+def extract_pages(source: str, on_progress=None) -> list:
+    """
+    Extract the text of every page of a PDF (path or doc:// handle), in page
+    order. Documents with at least PARALLEL_EXTRACTION_MIN_PAGES pages are
+    sharded across a process pool. on_progress(pages_done, pages_total) is
+    called as pages complete.
+    """
+    with open_pdf(source) as pdf:
+        page_count = len(pdf.pages)
+        if EXTRACTION_WORKERS <= 1 or page_count < PARALLEL_EXTRACTION_MIN_PAGES:
+            return _extract_pages_serial(pdf, on_progress)
+
+    try:
+        return _map_ranges_parallel(extract_page_range, source, page_count, on_progress)
+    except PARALLEL_ERRORS as e:
+        logger.warning("Parallel extraction unavailable (%s); extracting serially", e)
+        with open_pdf(source) as pdf:
+            return _extract_pages_serial(pdf, on_progress)
+
+
+def map_page_ranges(source: str, range_fn, page_count: int = None) -> list:
+    """
+    Per-page results of range_fn(source, start, stop) over every page of a
+    PDF, in page order, sharded across the process pool like extract_pages
+    for long documents. range_fn returns one result per page of its range
+    and must be a module-level function, as pool workers import it by name.
+    """
+    if page_count is None:
+        with open_pdf(source) as pdf:
+            page_count = len(pdf.pages)
+    if EXTRACTION_WORKERS > 1 and page_count >= PARALLEL_EXTRACTION_MIN_PAGES:
+        try:
+            return _map_ranges_parallel(range_fn, source, page_count)
+        except PARALLEL_ERRORS as e:
+            logger.warning("Parallel extraction unavailable (%s); extracting serially", e)
+    return range_fn(source, 0, page_count)
+
+
+def iter_pages(source: str):
+    """
+    Yield the text of each page of a PDF (path or doc:// handle) in order,
+    parsing a page only when the consumer asks for it. A consumer that stops
+    early never parses the remaining pages; closing the generator closes
+    the document.
+    """
+    with open_pdf(source) as pdf:
+        for page in pdf.pages:
+            yield extract_page_text(page)
+
+
+def format_pages(pages) -> str:
+    """
+    Render page texts in the '--- Page N ---' layout handed to the agents.
+    """
+    return "".join(
+        f"--- Page {page_num + 1} ---\n{content}\n" for page_num, content in enumerate(pages)
+    )
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from celery import states
+from dotenv import load_dotenv
+from celery_app import celery_app
+from metrics import current_task, task_label
+from routing import document_profile
+from task_client import MODE_AUTO
+import progress
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Crews run at once inside the API process (0 disables inline execution and
+# keeps CrewAI out of the API entirely)
+INLINE_MAX_CONCURRENCY = int(os.getenv("INLINE_MAX_CONCURRENCY", "0"))
+INLINE_MAX_PAGES = int(os.getenv("INLINE_MAX_PAGES", "10"))
+INLINE_MAX_BYTES = int(os.getenv("INLINE_MAX_BYTES", str(2 * 1024 * 1024)))
+
+logger = logging.getLogger(__name__)
+
+# Inline runs in progress. Only the event loop touches it, and a slot is
+# checked and taken with no await in between, so a busy API never queues
+# runs: it hands them to Celery.
+_running = 0
+
+
+def enabled() -> bool:
+    return INLINE_MAX_CONCURRENCY > 0
+
+
+def warm_up():
+    """
+    Build the agents for inline runs (blocking; call it off the event loop).
+    """
+    import crews
+
+    crews.warm_up()
+
+
+def eligible(digest: str) -> bool:
+    """
+    Small enough to run inline: at most INLINE_MAX_BYTES and INLINE_MAX_PAGES.
+    """
+    size, pages = document_profile(digest)
+    return size <= INLINE_MAX_BYTES and pages is not None and pages <= INLINE_MAX_PAGES
+
+
+def _run(task_name, task_type, query, filename, digest, task_id, use_cache, mode):
+    # Worker-only module, loaded on the first inline run
+    import celery_tasks
+
+    progress.publish("started", task_name=task_name, inline=True)
+    return celery_tasks.run_crew(query, filename, digest, task_type, task_name, task_id, use_cache, mode)
+
+
+def _store(task_id, result):
+    celery_app.backend.store_result(task_id, result, states.SUCCESS)
+    progress.publish("result", task_id=task_id, status="success", result=result)
+
+
+async def run_inline(task_name, task_type, query, filename, digest, task_id, use_cache=True,
+                     mode=MODE_AUTO) -> bool:
+    """
+    Run the crew for task_id in this process and store its result in the
+    Celery result backend, so /result and /stream serve it like any task.
+    Returns False, having done nothing, when inline execution is off, every
+    slot is busy, the document is too large or the LLM quota is exhausted;
+    the caller then enqueues the task as usual.
+    """
+    global _running
+    if not enabled() or _running >= INLINE_MAX_CONCURRENCY:
+        return False
+    if not await asyncio.to_thread(eligible, digest):
+        return False
+    # Slots may have filled up while eligibility was checked
+    if _running >= INLINE_MAX_CONCURRENCY:
+        return False
+
+    from rate_limiter import QuotaUnavailable
+
+    _running += 1
+    # The worker thread inherits this context: progress and metrics are
+    # attributed to task_id as they are for a Celery task
+    progress.begin_task(task_id)
+    current_task.set(task_label(task_name))
+    try:
+        # Crew.kickoff_async is asyncio.to_thread(kickoff); running all of
+        # run_crew in the thread also keeps its Redis calls off the loop
+        result = await asyncio.to_thread(
+            _run, task_name, task_type, query, filename, digest, task_id, use_cache, mode
+        )
+    except QuotaUnavailable:
+        logger.info("No LLM quota for inline run of %s; enqueueing", task_id)
+        return False
+    finally:
+        _running -= 1
+        progress.end_task()
+        current_task.set("none")
+
+    await asyncio.to_thread(_store, task_id, result)
+    return True
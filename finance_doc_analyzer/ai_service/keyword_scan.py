@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from document_cache import (
+    artifact_cache, artifact_path, digest_for_path, get_pages, iter_pages, page_cache
+)
+from extraction import format_pages
+
+# ------------------------
+# Keyword sets used by the heuristic tools
+# ------------------------
+RISK_KEYWORDS = [
+    'risk', 'market risk', 'credit risk', 'operational risk',
+    'financial risk', 'uncertainty', 'volatility', 'exposure'
+]
+NEGATIVE_WORDS = ['loss', 'deficit', 'decline', 'decrease']
+FINANCIAL_SECTIONS = [
+    'balance sheet', 'income statement', 'cash flow', 'profit & loss',
+    'financial summary', 'statement of operations'
+]
+KEY_TERMS = ['revenue', 'profit', 'loss', 'cash flow', 'assets', 'liabilities', 'equity']
+
+# Regex checks recorded per page alongside the keywords
+PATTERN_CHECKS = {
+    "year": re.compile(r'\b20\d{2}\b'),
+    "currency": re.compile(r'\$\d+'),
+}
+
+PAGE_MARKER_RE = re.compile(r"^--- Page \d+ ---$", re.MULTILINE)
+
+# Pages scan_document_until reads one at a time before handing a document
+# that has not yet satisfied it to full extraction
+LAZY_SCAN_MAX_PAGES = int(os.getenv("LAZY_SCAN_MAX_PAGES", "10"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalization the tools have always applied before keyword matching.
+    """
+    return text.replace("  ", " ").lower()
+
+
+def _trie_pattern(terms) -> str:
+    """
+    Compile terms into a trie-shaped alternation so each position is matched
+    in time proportional to the longest term, preferring the longest match.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node):
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+# ------------------------
+# Scan results
+# ------------------------
+class KeywordScan:
+    """
+    Keyword counts and page positions for one document. A partial scan
+    (complete=False) covers only its first page_count pages.
+    """
+
+    def __init__(self, counts: dict, pages: dict, patterns: dict, text_length: int, page_count: int,
+                 complete: bool = True):
+        self.counts = counts
+        self.pages = pages
+        self.patterns = patterns
+        self.text_length = text_length
+        self.page_count = page_count
+        self.complete = complete
+
+    def found(self, terms) -> list:
+        """
+        Terms present in the document, in the order given.
+        """
+        return [term for term in terms if self.counts.get(term)]
+
+    def has_pattern(self, name: str) -> bool:
+        return bool(self.patterns.get(name))
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "counts": self.counts,
+            "pages": self.pages,
+            "patterns": self.patterns,
+            "text_length": self.text_length,
+            "page_count": self.page_count,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str):
+        data = json.loads(raw)
+        return cls(data["counts"], data["pages"], data["patterns"],
+                   data["text_length"], data["page_count"])
+
+
+# ------------------------
+# Scanner
+# ------------------------
+class KeywordScanner:
+    """
+    Single-pass multi-keyword scanner. Overlapping matches are reported the
+    way substring checks see them: 'market risk' also counts as 'risk'.
+    """
+
+    def __init__(self, terms):
+        self.terms = sorted(set(terms))
+        self.pattern = re.compile("(?=(" + _trie_pattern(self.terms) + "))")
+        # Shorter terms that also match wherever a longer term matched
+        self.prefixes = {
+            term: [other for other in self.terms if other != term and term.startswith(other)]
+            for term in self.terms
+        }
+        self.version = hashlib.sha256(
+            json.dumps([self.terms, sorted((k, p.pattern) for k, p in PATTERN_CHECKS.items())])
+            .encode("utf-8")
+        ).hexdigest()[:12]
+
+    def scan_pages(self, pages, full_text: str = None) -> KeywordScan:
+        """
+        Scan page texts once for every keyword and pattern. full_text, if given,
+        is the original text the length check should see.
+        """
+        counts, positions, patterns = {}, {}, {name: [] for name in PATTERN_CHECKS}
+        for page_num, page in enumerate(pages, start=1):
+            self._scan_page(page, page_num, counts, positions, patterns)
+
+        if full_text is None:
+            full_text = format_pages(pages)
+        text_length = len(normalize_text(full_text).strip())
+        return KeywordScan(counts, positions, patterns, text_length, len(pages))
+
+    def scan_pages_until(self, pages, satisfied, max_pages: int = None) -> KeywordScan:
+        """
+        Scan an iterable of page texts one page at a time and stop as soon as
+        satisfied(scan so far) holds or max_pages pages were read, closing
+        the iterable, so lazily extracted pages past that point are never
+        parsed. The result is
+        partial (complete=False) when it stopped early; its text_length is
+        what scan_pages() reports for the pages read so far.
+        """
+        counts, positions, patterns = {}, {}, {name: [] for name in PATTERN_CHECKS}
+        text_length, page_count = 0, 0
+        # Length of the formatted blocks before the current one. Blocks start
+        # with '---', so no double space spans two of them and normalizing
+        # block by block matches normalizing the whole text; strip() only
+        # trims the end of the last block.
+        preceding = 0
+        page_iter = iter(pages)
+        try:
+            for page_count, page in enumerate(page_iter, start=1):
+                self._scan_page(page, page_count, counts, positions, patterns)
+                block = normalize_text(f"--- Page {page_count} ---\n{page}\n")
+                text_length = preceding + len(block.rstrip())
+                preceding += len(block)
+                scan = KeywordScan(counts, positions, patterns, text_length, page_count, complete=False)
+                if satisfied(scan) or (max_pages and page_count >= max_pages):
+                    return scan
+        finally:
+            # Generators release the document they are reading
+            close = getattr(page_iter, "close", None)
+            if close is not None:
+                close()
+        return KeywordScan(counts, positions, patterns, text_length, page_count)
+
+    def _scan_page(self, page: str, page_num: int, counts: dict, positions: dict, patterns: dict):
+        text = normalize_text(page)
+        page_counts = {}
+        for match in self.pattern.finditer(text):
+            term = match.group(1)
+            if not term:
+                continue
+            for hit in [term] + self.prefixes[term]:
+                page_counts[hit] = page_counts.get(hit, 0) + 1
+        for term, count in page_counts.items():
+            counts[term] = counts.get(term, 0) + count
+            positions.setdefault(term, []).append(page_num)
+        for name, regex in PATTERN_CHECKS.items():
+            if regex.search(text):
+                patterns[name].append(page_num)
+
+
+scanner = KeywordScanner(RISK_KEYWORDS + NEGATIVE_WORDS + FINANCIAL_SECTIONS + KEY_TERMS)
+
+
+def split_page_text(text: str) -> list:
+    """
+    Split '--- Page N ---' formatted text back into pages; plain text is one page.
+    """
+    parts = PAGE_MARKER_RE.split(text)
+    if len(parts) == 1:
+        return [text]
+    return [part[1:] if part.startswith("\n") else part for part in parts[1:]]
+
+
+def _load_scan(path: str) -> KeywordScan:
+    with open(path, "r", encoding="utf-8") as f:
+        return KeywordScan.from_json(f.read())
+
+
+def _scan_name() -> str:
+    return f"keyword_scan_{scanner.version}.json"
+
+
+def scan_document(path: str, digest: str = None) -> KeywordScan:
+    """
+    Keyword scan of a stored document, computed once and cached with it.
+    """
+    digest = digest or digest_for_path(path)
+    return artifact_cache.get_or_build(
+        digest,
+        _scan_name(),
+        _load_scan,
+        lambda: scanner.scan_pages(get_pages(path, digest)),
+        lambda scan, f: f.write(scan.to_json().encode("utf-8")),
+    )
+
+
+_partial_scans = OrderedDict()
+_partial_scans_lock = threading.Lock()
+PARTIAL_SCAN_CACHE_ENTRIES = 256
+
+
+def scan_document_until(path: str, satisfied, digest: str = None) -> KeywordScan:
+    """
+    Keyword scan of a stored document that reads pages only until
+    satisfied(scan so far) holds (see KeywordScanner.scan_pages_until).
+    Partial scans that satisfied the caller are memoized in-process by
+    digest. A document already scanned or extracted, or one not satisfied
+    within LAZY_SCAN_MAX_PAGES pages, gets the full scan, cached with it.
+    """
+    digest = digest or digest_for_path(path)
+    if os.path.exists(artifact_path(digest, _scan_name())) or page_cache.has_pages(digest):
+        return scan_document(path, digest)
+
+    with _partial_scans_lock:
+        scan = _partial_scans.get(digest)
+        if scan is not None:
+            _partial_scans.move_to_end(digest)
+    if scan is not None and satisfied(scan):
+        return scan
+
+    scan = scanner.scan_pages_until(iter_pages(path, digest), satisfied, max_pages=LAZY_SCAN_MAX_PAGES)
+    if not scan.complete and satisfied(scan):
+        with _partial_scans_lock:
+            _partial_scans[digest] = scan
+            while len(_partial_scans) > PARTIAL_SCAN_CACHE_ENTRIES:
+                _partial_scans.popitem(last=False)
+        return scan
+    # Read to the last page (iter_pages cached the pages) or out of lazy
+    # budget: the rest is extracted by get_pages, sharded across the pool
+    return scan_document(path, digest)
+
+
+_text_scans = OrderedDict()
+_text_scans_lock = threading.Lock()
+TEXT_SCAN_CACHE_ENTRIES = 32
+
+
+def scan_text(text: str) -> KeywordScan:
+    """
+    Keyword scan of raw document text, memoized in-process by content hash.
+    """
+    key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    with _text_scans_lock:
+        if key in _text_scans:
+            _text_scans.move_to_end(key)
+            return _text_scans[key]
+
+    result = scanner.scan_pages(split_page_text(text), full_text=text)
+    with _text_scans_lock:
+        _text_scans[key] = result
+        while len(_text_scans) > TEXT_SCAN_CACHE_ENTRIES:
+            _text_scans.popitem(last=False)
+    return result
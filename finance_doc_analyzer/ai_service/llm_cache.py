@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+from dotenv import load_dotenv
+from llm_config import llm_settings
+from redis_client import get_redis
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+# Upper bound on how long a crew run may hold the in-flight marker; a run
+# deferred for quota extends it by its countdown each time (refresh_inflight)
+LLM_CACHE_INFLIGHT_TTL = int(os.getenv("LLM_CACHE_INFLIGHT_TTL", "900"))
+
+ENTRY_PREFIX = "llm-cache:entry:"
+INFLIGHT_PREFIX = "llm-cache:inflight:"
+INDEX_KEY = "llm-cache:index"
+
+# Delete the in-flight marker only if it still belongs to the finishing task
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extend the in-flight marker if it still belongs to the deferred task, or
+# take it back if it expired and nobody else claimed the key meanwhile
+_REFRESH_SCRIPT = """
+local owner = redis.call('get', KEYS[1])
+if owner == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+if not owner then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+# ------------------------
+# Cache keys
+# ------------------------
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def cache_key(digest: str, task_name: str, query: str, mode: str) -> str:
+    """
+    Key a crew result on document, task, normalized query, analysis mode (as
+    resolved by routing.resolve_mode, never auto) and model settings.
+    """
+    material = json.dumps(
+        [digest, task_name, normalize_query(query), mode, llm_settings()], sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ------------------------
+# Result cache
+# ------------------------
+def get_cached_result(key: str):
+    """
+    Return the cached crew result for key, or None.
+    """
+    client = get_redis()
+    raw = client.get(ENTRY_PREFIX + key)
+    if raw is None:
+        return None
+    # Touch the entry so eviction is least-recently-used
+    client.zadd(INDEX_KEY, {key: time.time()})
+    return json.loads(raw)
+
+
+def store_result(key: str, result: dict):
+    """
+    Cache a successful crew result with a TTL, evicting the least recently
+    used entries beyond LLM_CACHE_MAX_ENTRIES.
+    """
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.set(ENTRY_PREFIX + key, json.dumps(result), ex=LLM_CACHE_TTL)
+    pipe.zadd(INDEX_KEY, {key: time.time()})
+    pipe.zcard(INDEX_KEY)
+    size = pipe.execute()[-1]
+
+    overflow = size - LLM_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted = [k.decode() for k, _ in client.zpopmin(INDEX_KEY, overflow)]
+        if evicted:
+            client.delete(*[ENTRY_PREFIX + k for k in evicted])
+
+    # Drop index members whose entries already expired through the TTL
+    client.zremrangebyscore(INDEX_KEY, "-inf", time.time() - LLM_CACHE_TTL)
+
+
+# ------------------------
+# In-flight coalescing
+# ------------------------
+def claim_inflight(key: str, task_id: str):
+    """
+    Mark task_id as the run producing key. Returns None if the claim
+    succeeded, otherwise the id of the task already producing it.
+    """
+    client = get_redis()
+    if client.set(INFLIGHT_PREFIX + key, task_id, nx=True, ex=LLM_CACHE_INFLIGHT_TTL):
+        return None
+    existing = client.get(INFLIGHT_PREFIX + key)
+    if existing is None:
+        # The other run finished between SET and GET; retry once
+        return claim_inflight(key, task_id)
+    return existing.decode()
+
+
+def release_inflight(key: str, task_id: str):
+    get_redis().eval(_RELEASE_SCRIPT, 1, INFLIGHT_PREFIX + key, task_id)
+
+
+def refresh_inflight(key: str, task_id: str, delay: float):
+    """
+    Keep task_id's claim on key for delay seconds more than a fresh claim,
+    so a run requeued with a countdown is still the one identical
+    submissions coalesce onto when it starts.
+    """
+    ttl = int(delay) + 1 + LLM_CACHE_INFLIGHT_TTL
+    get_redis().eval(_REFRESH_SCRIPT, 1, INFLIGHT_PREFIX + key, task_id, ttl)
@@ -0,0 +1,31 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# ------------------------
+# LLM settings shared by the agents (worker) and cache keys (API)
+# ------------------------
+# "gemini" calls the provider; "offline" uses the deterministic OfflineLLM
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+OFFLINE = LLM_BACKEND == "offline"
+LLM_MODEL = os.getenv("LLM_MODEL", "offline/deterministic" if OFFLINE else "gemini/gemini-2.0-flash")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "8000"))
+
+# Provider quota shared by all workers (0 = unlimited); see rate_limiter.py
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "0" if OFFLINE else "15"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0" if OFFLINE else "1000000"))
+# Per-agent throttle, only needed against the provider with the shared limiter off
+AGENT_MAX_RPM = None if LLM_RPM_LIMIT or OFFLINE else 5
+
+
+def llm_settings() -> dict:
+    return {
+        "backend": LLM_BACKEND,
+        "model": LLM_MODEL,
+        "temperature": LLM_TEMPERATURE,
+        "max_tokens": LLM_MAX_TOKENS,
+    }
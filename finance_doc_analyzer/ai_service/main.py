@@ -1,55 +1,115 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from celery.result import AsyncResult
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from celery import group, states
+import asyncio
+import json
 import os
 import uuid
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
+from document_store import get_document_store, is_digest
+import inline_runner
 from celery_app import celery_app
-import celery_tasks
+from llm_cache import cache_key, claim_inflight, get_cached_result, normalize_query
+from metrics import api_stage, record_cache, render
+from progress import stream_progress
+from routing import document_profile, resolve_mode, route_for
+from report_archive import report_archive
+from task_client import (
+    ANALYSIS_MODES, ANALYZE_TASK, INVESTMENT_TASK, MAP_REDUCE_TASKS, MODE_MAP_REDUCE, RISK_TASK, VERIFY_TASK,
+    analysis_task, build_analyze_all
+)
+from task_results import (
+    etag_matches, final_etag_match, load_batch, save_batch, status_etag, summarize_statuses, task_status,
+    task_statuses
+)
 
 # Load environment variables
 load_dotenv()
 
-# Ensure GEMINI_API_KEY is set
-if not os.getenv("GEMINI_API_KEY"):
-    raise ValueError("GEMINI_API_KEY environment variable is not set. Please check your .env file.")
-
+# The API only enqueues by task name; the workers hold the LLM key and agents
 app = FastAPI(title="Financial Document Analyzer")
 
 # Defaults
 DEFAULT_QUERY = "Analyze this financial document for investment insights"
 DEFAULT_FILE_PATH = "data/TSLA-Q2-2025-Update.pdf"
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", "1000"))
+# Mode used when a request does not choose one: auto, full or map_reduce
+DEFAULT_ANALYSIS_MODE = os.getenv("DEFAULT_ANALYSIS_MODE", "auto")
+# Uploads are copied into the store in chunks and rejected past the limit
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+
+@app.on_event("startup")
+async def warm_up_inline_runner():
+    # Inline execution runs crews in this process; build the agents up front
+    if inline_runner.enabled():
+        await asyncio.to_thread(inline_runner.warm_up)
 
 
 # --- File Handling ---
+_default_digest = None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Uploaded file exceeds {UPLOAD_MAX_BYTES} bytes")
+
+
+async def store_upload(file: UploadFile, store) -> str:
+    """
+    Stream an upload into the document store chunk by chunk, hashing on the
+    way, so the API never holds a whole document. Returns the digest.
+    """
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise _too_large()
+
+    with store.writer() as writer:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if writer.size + len(chunk) > UPLOAD_MAX_BYTES:
+                raise _too_large()
+            writer.write(chunk)
+        if not writer.size:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        return writer.commit()
+
+
 async def handle_file_upload(file: Optional[UploadFile]):
     """
-    Save uploaded file (if provided) or fallback to default file.
-    Returns (filename, file_bytes, use_uploaded_file).
+    Store uploaded file (if provided) or fallback to default file in the document store.
+    Returns (filename, digest, use_uploaded_file).
     """
+    global _default_digest
     use_uploaded_file = False
     filename = os.path.basename(DEFAULT_FILE_PATH)
-    file_bytes = None
+    store = get_document_store()
 
     if file:
         file_id = str(uuid.uuid4())
         filename = f"financial_document_{file_id}.pdf"
         use_uploaded_file = True
         try:
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=400, detail="Uploaded file is empty")
-            file_bytes = content
+            digest = await store_upload(file, store)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error reading uploaded file: {str(e)}")
     else:
-        # fallback to default
-        if not os.path.exists(DEFAULT_FILE_PATH):
-            raise HTTPException(status_code=404, detail=f"Default file not found at {DEFAULT_FILE_PATH}")
-        with open(DEFAULT_FILE_PATH, "rb") as f:
-            file_bytes = f.read()
+        # fallback to default, stored once per process
+        if _default_digest is None or not store.exists(_default_digest):
+            if not os.path.exists(DEFAULT_FILE_PATH):
+                raise HTTPException(status_code=404, detail=f"Default file not found at {DEFAULT_FILE_PATH}")
+            with open(DEFAULT_FILE_PATH, "rb") as f:
+                _default_digest = store.put(f.read())
+        digest = _default_digest
 
-    return filename, file_bytes, use_uploaded_file
+    # Classify at ingest: routing reads the size and page count from here on
+    await asyncio.to_thread(document_profile, digest)
+    return filename, digest, use_uploaded_file
 
 
 # --- Health Check ---
@@ -58,24 +118,114 @@ async def root():
     return {"message": "Financial Document Analyzer API is running with Celery + Redis"}
 
 
+# --- Prometheus Metrics ---
+@app.get("/metrics")
+async def metrics():
+    # Collectors read Redis; keep them off the event loop
+    body, content_type = await asyncio.to_thread(render)
+    return Response(content=body, media_type=content_type)
+
+
 # --- Celery Endpoint Factory ---
-def create_celery_endpoint(task_fn, default_query: str):
+def check_mode(mode: str, task_names=()):
+    """
+    Reject unknown modes, and map_reduce for tasks without a map-reduce
+    variant. Endpoints running several analyses pass no task names: those
+    tasks simply run in full.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(ANALYSIS_MODES)}")
+    if mode == MODE_MAP_REDUCE and any(task_name not in MAP_REDUCE_TASKS for task_name in task_names):
+        raise HTTPException(status_code=400, detail="map_reduce mode is only available for analyze and risk")
+
+
+def analysis_signature(task_name: str, query: str, filename: str, digest: str, no_cache: bool, mode: str):
+    """
+    Signature for one analysis with a pre-assigned task id, or None when no
+    run is needed: the result is already cached (and is stored under the new
+    task id, so /result serves it), or an identical submission is in flight
+    and its task id is reused.
+    Returns (signature, task_id, coalesced, cached_result).
+    """
+    task_id = str(uuid.uuid4())
+    if not no_cache:
+        key = cache_key(digest, task_name, query, resolve_mode(mode, task_name, digest))
+        cached = get_cached_result(key)
+        record_cache("submission", cached is not None)
+        if cached is not None:
+            celery_app.backend.store_result(task_id, cached, states.SUCCESS)
+            report_archive.link_task(task_id, key)
+            return None, task_id, False, cached
+
+        existing_task_id = claim_inflight(key, task_id)
+        record_cache("inflight", existing_task_id is not None)
+        if existing_task_id:
+            return None, existing_task_id, True, None
+
+    signature = analysis_task(
+        task_name, query, filename, digest, use_cache=not no_cache, mode=mode
+    ).set(task_id=task_id, **route_for(task_name, digest))
+    return signature, task_id, False, None
+
+
+def create_celery_endpoint(task_type: str, task_name: str, default_query: str):
     """
     Factory for endpoints that enqueue Celery tasks.
     """
     async def endpoint(
         query: str = Form(default=default_query),
-        file: Optional[UploadFile] = File(None)
+        file: Optional[UploadFile] = File(None),
+        no_cache: bool = Form(default=False),
+        inline: bool = Form(default=False),
+        mode: str = Form(default=DEFAULT_ANALYSIS_MODE)
     ):
-        filename, file_bytes, use_uploaded_file = await handle_file_upload(file)
+        check_mode(mode, [task_name])
+        with api_stage("upload", task_type):
+            filename, digest, use_uploaded_file = await handle_file_upload(file)
 
-        # Enqueue Celery task
-        task = task_fn.apply_async(args=[query, filename, file_bytes])
+        # Cache, result backend, archive and in-flight lookups all block
+        signature, task_id, coalesced, cached = await asyncio.to_thread(
+            analysis_signature, task_name, query, filename, digest, no_cache, mode
+        )
+        if cached is not None:
+            # Same document, task and query already answered
+            return {
+                "status": "success",
+                "task_id": task_id,
+                "query": query,
+                "mode": mode,
+                "document_digest": digest,
+                "coalesced": False,
+                "cached": True,
+                "result": cached,
+                "inline": False,
+                "using_default_file": not use_uploaded_file,
+                "uploaded_filename": file.filename if use_uploaded_file else None
+            }
+
+        ran_inline = False
+        if signature is not None and inline:
+            # Small documents run here when a slot is free; the result is
+            # ready by the time the response is sent
+            with api_stage("inline", task_type):
+                ran_inline = await inline_runner.run_inline(
+                    task_name, task_type, query, filename, digest, task_id, use_cache=not no_cache, mode=mode
+                )
+        if signature is not None and not ran_inline:
+            with api_stage("enqueue", task_type):
+                # Enqueue Celery task; only the digest travels through the broker
+                signature.apply_async()
 
         return {
             "status": "submitted",
-            "task_id": task.id,
+            "task_id": task_id,
             "query": query,
+            "mode": mode,
+            "document_digest": digest,
+            "coalesced": coalesced,
+            "cached": False,
+            "inline": ran_inline,
+            "queue": signature.options["queue"] if signature is not None and not ran_inline else None,
             "using_default_file": not use_uploaded_file,
             "uploaded_filename": file.filename if use_uploaded_file else None
         }
@@ -84,26 +234,246 @@ def create_celery_endpoint(task_fn, default_query: str):
 
 
 # --- Register Celery-backed Endpoints ---
-app.post("/analyze")(create_celery_endpoint(celery_tasks.analyze_financial_document_task, DEFAULT_QUERY))
-app.post("/investment")(create_celery_endpoint(celery_tasks.investment_analysis_task, "Provide detailed investment insights"))
-app.post("/risk")(create_celery_endpoint(celery_tasks.risk_assessment_task, "Perform a detailed risk assessment"))
-app.post("/verify")(create_celery_endpoint(celery_tasks.verification_task, "Verify document completeness and relevance"))
+ANALYSIS_TASKS = {
+    "analyze": (ANALYZE_TASK, DEFAULT_QUERY),
+    "investment": (INVESTMENT_TASK, "Provide detailed investment insights"),
+    "risk": (RISK_TASK, "Perform a detailed risk assessment"),
+    "verify": (VERIFY_TASK, "Verify document completeness and relevance"),
+}
+
+for task_type, (task_name, task_default_query) in ANALYSIS_TASKS.items():
+    app.post(f"/{task_type}")(create_celery_endpoint(task_type, task_name, task_default_query))
+
+
+# --- Combined Analysis Endpoint ---
+@app.post("/analyze-all")
+async def analyze_all(
+    query: Optional[str] = Form(default=None),
+    file: Optional[UploadFile] = File(None),
+    no_cache: bool = Form(default=False),
+    mode: str = Form(default=DEFAULT_ANALYSIS_MODE)
+):
+    """
+    Run all four analyses over one upload and one shared extraction.
+    Without a query, each analysis uses its own default query. In
+    map_reduce (or auto) mode, analyze and risk share the section summaries
+    built while preparing the document; the other two always run in full.
+    """
+    check_mode(mode)
+    with api_stage("upload", "analyze-all"):
+        filename, digest, use_uploaded_file = await handle_file_upload(file)
+
+    query_by_type = {
+        task_type: query or task_default_query
+        for task_type, (_, task_default_query) in ANALYSIS_TASKS.items()
+    }
+    task_names_by_type = {task_type: task_name for task_type, (task_name, _) in ANALYSIS_TASKS.items()}
+    with api_stage("enqueue", "analyze-all"):
+        task = build_analyze_all(
+            query_by_type, filename, digest, task_names_by_type, use_cache=not no_cache, mode=mode,
+            route=lambda task_name: route_for(task_name, digest)
+        ).apply_async()
+
+    return {
+        "status": "submitted",
+        "task_id": task.id,
+        "query": query,
+        "mode": mode,
+        "task_types": list(query_by_type),
+        "document_digest": digest,
+        "using_default_file": not use_uploaded_file,
+        "uploaded_filename": file.filename if use_uploaded_file else None
+    }
+
+
+# --- Batch Endpoints ---
+def _split_list(value: Optional[str]) -> list:
+    return [item.strip() for item in (value or "").replace("\n", ",").split(",") if item.strip()]
+
+
+@app.post("/batch")
+async def submit_batch(
+    files: List[UploadFile] = File(default=[]),
+    digests: Optional[str] = Form(default=None),
+    task_types: str = Form(default="analyze"),
+    query: Optional[str] = Form(default=None),
+    no_cache: bool = Form(default=False),
+    mode: str = Form(default=DEFAULT_ANALYSIS_MODE)
+):
+    """
+    Enqueue every requested analysis of every document as one Celery group.
+    Documents are uploaded files and/or comma-separated digests of documents
+    already in the store. Without a query, each analysis uses its default query.
+    """
+    requested_types = _split_list(task_types)
+    unknown = [task_type for task_type in requested_types if task_type not in ANALYSIS_TASKS]
+    if not requested_types or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"task_types must be a comma-separated subset of {list(ANALYSIS_TASKS)}",
+        )
+    check_mode(mode)
+
+    store = get_document_store()
+    documents = []
+    for digest in _split_list(digests):
+        if not is_digest(digest) or not store.exists(digest):
+            raise HTTPException(status_code=404, detail=f"Document {digest} not found in store")
+        await asyncio.to_thread(document_profile, digest)
+        documents.append((f"{digest}.pdf", digest, None))
+    with api_stage("upload", "batch"):
+        for file in files:
+            filename, digest, _ = await handle_file_upload(file)
+            documents.append((filename, digest, file.filename))
+    if not documents:
+        raise HTTPException(status_code=400, detail="Provide files and/or digests")
+    if len(documents) * len(requested_types) > BATCH_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_TASKS} tasks")
+
+    def plan_batch():
+        signatures, tasks = [], []
+        for filename, digest, uploaded_filename in documents:
+            for task_type in requested_types:
+                task_name, task_default_query = ANALYSIS_TASKS[task_type]
+                signature, task_id, coalesced, cached = analysis_signature(
+                    task_name, query or task_default_query, filename, digest, no_cache, mode
+                )
+                if signature is not None:
+                    signatures.append(signature)
+                tasks.append({
+                    "task_id": task_id,
+                    "task_type": task_type,
+                    "document_digest": digest,
+                    "uploaded_filename": uploaded_filename,
+                    "coalesced": coalesced,
+                    "cached": cached is not None,
+                    "queue": signature.options["queue"] if signature is not None else None,
+                })
+        return signatures, tasks
+
+    # Every pair makes blocking cache and in-flight lookups: one thread for all
+    signatures, tasks = await asyncio.to_thread(plan_batch)
+
+    # One group for the whole batch; the manifest also lists tasks coalesced
+    # onto runs already in flight and those answered from the cache
+    batch_id = str(uuid.uuid4())
+    with api_stage("enqueue", "batch"):
+        save_batch(batch_id, tasks)
+        if signatures:
+            group(signatures).apply_async(group_id=batch_id)
+
+    return {
+        "status": "submitted",
+        "batch_id": batch_id,
+        "mode": mode,
+        "task_types": requested_types,
+        "task_count": len(tasks),
+        "tasks": tasks,
+    }
+
+
+@app.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    def lookup():
+        tasks = load_batch(batch_id)
+        if tasks is None:
+            return None, None
+        return tasks, task_statuses([task["task_id"] for task in tasks])
+
+    # Redis reads, result decoding and archive queries: one thread for all
+    tasks, statuses = await asyncio.to_thread(lookup)
+    if tasks is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    results = [{**task, **status} for task, status in zip(tasks, statuses)]
+    return {"batch_id": batch_id, "summary": summarize_statuses(statuses), "results": results}
+
+
+class ResultsRequest(BaseModel):
+    task_ids: List[str]
+
+
+@app.post("/results")
+async def get_results(request: ResultsRequest):
+    """
+    Status and results of many tasks from one round trip to the result backend.
+    """
+    if len(request.task_ids) > BATCH_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TASKS} task ids per request")
+    statuses = await asyncio.to_thread(task_statuses, request.task_ids)
+    return {"summary": summarize_statuses(statuses), "results": statuses}
 
 
 # --- Task Result Endpoint ---
 @app.get("/result/{task_id}")
-async def get_result(task_id: str):
-    result = AsyncResult(task_id, app=celery_app)
-    if not result:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if result.state == "PENDING":
-        return {"task_id": task_id, "status": "pending"}
-    elif result.state == "STARTED":
-        return {"task_id": task_id, "status": "running"}
-    elif result.state == "SUCCESS":
-        return {"task_id": task_id, "status": "success", "result": result.result}
-    elif result.state == "FAILURE":
-        return {"task_id": task_id, "status": "failed", "error": str(result.result)}
-    else:
-        return {"task_id": task_id, "status": result.state}
+async def get_result(task_id: str, response: Response, if_none_match: Optional[str] = Header(default=None)):
+    """
+    Task status and result, with an ETag: pollers sending If-None-Match get
+    304 Not Modified until the status changes, and a finished task is
+    confirmed without reading its result at all.
+    """
+    etag = final_etag_match(task_id, if_none_match)
+    if etag is None:
+        status = await asyncio.to_thread(task_status, task_id)
+        etag = status_etag(task_id, status["status"])
+        if not etag_matches(if_none_match, etag):
+            response.headers["ETag"] = etag
+            return status
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+# --- Report Archive ---
+TASK_TYPES_BY_NAME = {task_name: task_type for task_type, (task_name, _) in ANALYSIS_TASKS.items()}
+
+
+@app.get("/documents/{digest}/reports")
+async def list_document_reports(
+    digest: str,
+    task_type: Optional[str] = None,
+    query: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    include_result: bool = False
+):
+    """
+    Reports archived for a document, newest first, optionally for one
+    analysis type and one query (matched case- and whitespace-insensitively).
+    """
+    if not is_digest(digest):
+        raise HTTPException(status_code=400, detail="Invalid document digest")
+    if task_type is not None and task_type not in ANALYSIS_TASKS:
+        raise HTTPException(status_code=400, detail=f"task_type must be one of {list(ANALYSIS_TASKS)}")
+
+    reports = await asyncio.to_thread(
+        report_archive.list_reports,
+        digest,
+        ANALYSIS_TASKS[task_type][0] if task_type else None,
+        normalize_query(query) if query is not None else None,
+        limit,
+        include_result,
+    )
+    for report in reports:
+        report["task_type"] = TASK_TYPES_BY_NAME.get(report.pop("task_name"))
+    return {"document_digest": digest, "count": len(reports), "reports": reports}
+
+
+# --- Task Progress Stream ---
+@app.get("/stream/{task_id}")
+async def stream_result(task_id: str):
+    """
+    Server-sent events for a task: started, extraction, crew_started, llm_call,
+    then a final result or failed event carrying the same payload as /result.
+    """
+    def initial_state():
+        # Finished before any progress was recorded (or the record expired)
+        status = task_status(task_id)
+        if status["status"] == "success":
+            return json.dumps({**status, "event": "result"}, default=str)
+        if status["status"] == "failed":
+            return json.dumps({**status, "event": "failed"})
+        return None
+
+    return StreamingResponse(
+        stream_progress(task_id, initial_state),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,265 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+import redis
+from dotenv import load_dotenv
+from celery.signals import (
+    before_task_publish, task_postrun, task_prerun, worker_init, worker_process_shutdown
+)
+from celery_app import PRIORITY_LEVELS, celery_app, priority_list
+from redis_client import get_redis
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Prefork workers need a directory shared by the pool processes; it must be
+# in the environment before prometheus_client is first imported
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+# Port of the worker's metrics server (0 disables it)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9808"))
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess, start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RSS_BUCKETS = tuple(2 ** exponent * 1024 * 1024 for exponent in range(6, 14))  # 64 MiB .. 8 GiB
+
+logger = logging.getLogger(__name__)
+
+# Celery task (short name) whose work code in this context is attributed to
+current_task = contextvars.ContextVar("metrics_task", default="none")
+_task_started = contextvars.ContextVar("metrics_task_started", default=None)
+_llm_call_started = contextvars.ContextVar("metrics_llm_call_started", default=None)
+
+
+# ------------------------
+# Metrics
+# ------------------------
+API_STAGE_SECONDS = Histogram(
+    "fda_api_stage_seconds",
+    "Time spent in each stage of an API request",
+    ["stage", "endpoint"],
+    buckets=STAGE_BUCKETS,
+)
+TASK_STAGE_SECONDS = Histogram(
+    "fda_task_stage_seconds",
+    "Time spent in each stage of a Celery task",
+    ["stage", "task"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "fda_llm_tokens",
+    "LLM tokens sent (in) and generated (out)",
+    ["task", "direction"],
+)
+TASK_RSS_BYTES = Histogram(
+    "fda_task_rss_bytes",
+    "Worker resident memory per task: the peak while it ran and what remained after",
+    ["task", "point"],
+    buckets=RSS_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "fda_cache_lookups",
+    "Cache lookups by cache and outcome; hit ratio = hit / (hit + miss)",
+    ["cache", "result"],
+)
+
+
+def task_label(task_name: str) -> str:
+    return task_name.rsplit(".", 1)[-1]
+
+
+def observe_api_stage(stage: str, endpoint: str, seconds: float):
+    API_STAGE_SECONDS.labels(stage=stage, endpoint=endpoint).observe(seconds)
+
+
+def observe_task_stage(stage: str, seconds: float, task: str = None):
+    TASK_STAGE_SECONDS.labels(stage=stage, task=task or current_task.get()).observe(seconds)
+
+
+@contextmanager
+def api_stage(stage: str, endpoint: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_api_stage(stage, endpoint, time.perf_counter() - started)
+
+
+@contextmanager
+def task_stage(stage: str):
+    """
+    Time a stage of the Celery task running in this context.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_task_stage(stage, time.perf_counter() - started)
+
+
+def observe_task_rss(task: str, peak_bytes: int, after_bytes: int):
+    TASK_RSS_BYTES.labels(task=task, point="peak").observe(peak_bytes)
+    TASK_RSS_BYTES.labels(task=task, point="after").observe(after_bytes)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int, task: str = None):
+    task = task or current_task.get()
+    LLM_TOKENS.labels(task=task, direction="in").inc(prompt_tokens or 0)
+    LLM_TOKENS.labels(task=task, direction="out").inc(completion_tokens or 0)
+
+
+def llm_call_started():
+    _llm_call_started.set(time.perf_counter())
+
+
+def llm_call_completed():
+    started = _llm_call_started.get()
+    if started is not None:
+        _llm_call_started.set(None)
+        observe_task_stage("llm_call", time.perf_counter() - started)
+
+
+# ------------------------
+# Queue depth
+# ------------------------
+class QueueDepthCollector:
+    """
+    Messages waiting in each broker priority list, and how long the next one
+    to be served in each queue has waited. Read from the broker at scrape
+    time with LLEN and LINDEX, so a scrape costs the same however long the
+    backlog is, and every process reports the same numbers.
+    """
+
+    def collect(self):
+        broker = GaugeMetricFamily(
+            "fda_broker_queue_length", "Messages waiting in the broker queue", labels=["queue", "priority"]
+        )
+        oldest = GaugeMetricFamily(
+            "fda_broker_oldest_message_age_seconds",
+            "Longest wait among the messages next in line at each priority level of the queue",
+            labels=["queue"],
+        )
+        queues = [celery_app.conf.task_default_queue]
+        queues += [q.name for q in celery_app.conf.task_queues or [] if q.name not in queues]
+        # Each queue is one Redis list per priority level, served from the right
+        lists = [(queue, priority) for queue in queues for priority in range(PRIORITY_LEVELS)]
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for queue, priority in lists:
+                pipe.llen(priority_list(queue, priority))
+                pipe.lindex(priority_list(queue, priority), -1)
+            replies = pipe.execute()
+        except redis.RedisError:
+            logger.warning("Could not read queue depth from Redis")
+            return
+        now = time.time()
+        ages = {}
+        for (queue, priority), length, head in zip(lists, replies[::2], replies[1::2]):
+            broker.add_metric([queue, str(priority)], length)
+            published_at = _published_at(head)
+            if published_at is not None:
+                ages[queue] = max(ages.get(queue, 0.0), now - published_at)
+        for queue in queues:
+            oldest.add_metric([queue], max(0.0, ages.get(queue, 0.0)))
+        yield broker
+        yield oldest
+
+
+def _published_at(raw):
+    if raw is None:
+        return None
+    try:
+        return float(json.loads(raw)["headers"]["published_at"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    Registry served by /metrics and the worker's metrics server: this
+    process's metrics, or every pool process's in multiprocess mode.
+    """
+    global _registry
+    if _registry is None:
+        if PROMETHEUS_MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        registry.register(QueueDepthCollector())
+        _registry = registry
+    return _registry
+
+
+def render() -> tuple:
+    """
+    Exposition body and content type for a /metrics response.
+    """
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+# ------------------------
+# Celery signal handlers
+# ------------------------
+@before_task_publish.connect
+def _task_published(sender=None, headers=None, **kwargs):
+    # Runs in whichever process enqueues (API or a worker building a canvas)
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def _task_started_metrics(task=None, **kwargs):
+    label = task_label(task.name)
+    current_task.set(label)
+    _task_started.set(time.perf_counter())
+
+    published_at = getattr(task.request, "published_at", None)
+    # A countdown (quota retry) is deliberate delay, not queueing
+    if published_at and not task.request.eta:
+        observe_task_stage("queue_wait", max(0.0, time.time() - published_at), label)
+
+
+@task_postrun.connect
+def _task_finished_metrics(**kwargs):
+    started = _task_started.get()
+    if started is not None:
+        observe_task_stage("task", time.perf_counter() - started)
+    current_task.set("none")
+    _task_started.set(None)
+
+
+@worker_init.connect
+def _start_metrics_server(**kwargs):
+    if not WORKER_METRICS_PORT:
+        return
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Values left by a previous run of this worker would be summed in
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+    start_http_server(WORKER_METRICS_PORT, registry=get_registry())
+    logger.info("Serving worker metrics on port %d", WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def _pool_process_exited(pid=None, **kwargs):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
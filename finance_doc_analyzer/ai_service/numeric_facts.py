@@ -0,0 +1,233 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from document_cache import artifact_cache, digest_for_path, get_pages
+from keyword_scan import split_page_text
+
+FACTS_ARTIFACT = "numeric_facts_v1.npz"
+
+# ------------------------
+# Encodings for the fact columns
+# ------------------------
+CURRENCIES = ["", "USD", "EUR", "GBP"]
+CURRENCY_SYMBOLS = {"$": "USD", "us$": "USD", "usd": "USD", "€": "EUR", "eur": "EUR", "£": "GBP", "gbp": "GBP"}
+SCALE_EXPONENTS = {
+    "thousand": 3, "thousands": 3, "k": 3,
+    "million": 6, "millions": 6, "mm": 6, "m": 6,
+    "billion": 9, "billions": 9, "bn": 9, "b": 9,
+    "trillion": 12, "trillions": 12,
+}
+# Period code: year * 10 + quarter (0 = full year); -1 = unknown
+UNKNOWN_PERIOD = -1
+
+AMOUNT_RE = re.compile(
+    r"(?P<currency>US\$|\$|€|£|\b(?:USD|EUR|GBP)\b)?\s?"
+    r"(?P<open>\()?(?:(?<![\w)])(?P<sign>-))?(?<![\w.])(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?P<close>\))?"
+    r"(?:\s?(?P<percent>%)|\s?(?P<scale>thousands?|millions?|billions?|trillions?|bn)\b|(?P<suffix>mm|[kmb])\b)?",
+    re.IGNORECASE,
+)
+PAGE_SCALE_RE = re.compile(r"\bin (thousands|millions|billions)\b", re.IGNORECASE)
+QUARTER_RE = re.compile(r"\bQ([1-4])\s?(?:FY)?'?(20\d{2}|\d{2})\b", re.IGNORECASE)
+FISCAL_YEAR_RE = re.compile(r"\b(?:FY|fiscal(?: year)?)\s?'?(20\d{2}|\d{2})\b", re.IGNORECASE)
+YEAR_RE = re.compile(r"\b(20\d{2})\b")
+
+
+def _year(value: str) -> int:
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+
+def detect_period(text: str) -> int:
+    """
+    Most specific fiscal period mentioned in text, encoded as year * 10 + quarter.
+    """
+    match = QUARTER_RE.search(text)
+    if match:
+        return _year(match.group(2)) * 10 + int(match.group(1))
+    match = FISCAL_YEAR_RE.search(text) or YEAR_RE.search(text)
+    if match:
+        return _year(match.group(1)) * 10
+    return UNKNOWN_PERIOD
+
+
+def format_period(code: int) -> str:
+    if code == UNKNOWN_PERIOD:
+        return "n/a"
+    year, quarter = divmod(int(code), 10)
+    return f"Q{quarter} {year}" if quarter else f"FY{year}"
+
+
+# ------------------------
+# Fact table
+# ------------------------
+class FactTable:
+    """
+    Numeric figures of one document in array-backed columns:
+    value (scaled), raw, currency, scale exponent, percent flag, period,
+    page (1-based) and character offset within the page.
+    """
+
+    COLUMNS = ("value", "raw", "currency", "scale", "percent", "period", "page", "offset")
+
+    def __init__(self, value, raw, currency, scale, percent, period, page, offset):
+        self.value = np.asarray(value, dtype=np.float64)
+        self.raw = np.asarray(raw, dtype=np.float64)
+        self.currency = np.asarray(currency, dtype=np.int8)
+        self.scale = np.asarray(scale, dtype=np.int8)
+        self.percent = np.asarray(percent, dtype=np.bool_)
+        self.period = np.asarray(period, dtype=np.int32)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.offset = np.asarray(offset, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.value)
+
+    def take(self, mask):
+        return FactTable(*(getattr(self, column)[mask] for column in self.COLUMNS))
+
+    def query(self, currency: str = None, min_value: float = None, max_value: float = None,
+              first_page: int = None, last_page: int = None, period: int = None,
+              include_percent: bool = False):
+        """
+        Vectorized filter, e.g. query(currency="USD", min_value=1e6, first_page=3, last_page=10).
+        """
+        mask = np.ones(len(self), dtype=np.bool_)
+        if not include_percent:
+            mask &= ~self.percent
+        if currency:
+            code = currency.upper()
+            # An unknown currency selects nothing
+            mask &= self.currency == (CURRENCIES.index(code) if code in CURRENCIES else -1)
+        if min_value is not None:
+            mask &= self.value >= min_value
+        if max_value is not None:
+            mask &= self.value <= max_value
+        if first_page is not None:
+            mask &= self.page >= first_page
+        if last_page is not None:
+            mask &= self.page <= last_page
+        if period is not None:
+            mask &= self.period == period
+        return self.take(mask)
+
+    def monetary(self):
+        """
+        Figures that are amounts rather than percentages.
+        """
+        return self.take(~self.percent)
+
+    def dump(self, f):
+        np.savez(f, **{column: getattr(self, column) for column in self.COLUMNS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            return cls(*(npz[column] for column in cls.COLUMNS))
+
+
+def extract_facts(pages) -> FactTable:
+    """
+    Extract every numeric figure with its currency, unit scale, period and page.
+    Bare years are treated as periods, not figures.
+    """
+    columns = {column: [] for column in FactTable.COLUMNS}
+    for page_num, text in enumerate(pages, start=1):
+        page_scale = PAGE_SCALE_RE.search(text)
+        page_exponent = SCALE_EXPONENTS[page_scale.group(1).lower()] if page_scale else 0
+        page_period = detect_period(text)
+
+        line_start = 0
+        for line in text.split("\n"):
+            line_period = detect_period(line)
+            period = line_period if line_period != UNKNOWN_PERIOD else page_period
+            for match in AMOUNT_RE.finditer(line):
+                number = match.group("number")
+                currency = CURRENCY_SYMBOLS.get((match.group("currency") or "").lower(), "")
+                percent = bool(match.group("percent"))
+                scale_word = (match.group("scale") or match.group("suffix") or "").lower()
+                if not currency and not percent and not scale_word and YEAR_RE.fullmatch(number):
+                    continue
+
+                raw = float(number.replace(",", ""))
+                if match.group("sign") or (match.group("open") and match.group("close")):
+                    raw = -raw  # accounting negatives are written (1,234)
+                exponent = SCALE_EXPONENTS.get(scale_word, 0 if percent else page_exponent)
+
+                columns["value"].append(raw * 10 ** exponent)
+                columns["raw"].append(raw)
+                columns["currency"].append(CURRENCIES.index(currency))
+                columns["scale"].append(exponent)
+                columns["percent"].append(percent)
+                columns["period"].append(period)
+                columns["page"].append(page_num)
+                columns["offset"].append(line_start + match.start("number"))
+            line_start += len(line) + 1
+
+    return FactTable(*(columns[column] for column in FactTable.COLUMNS))
+
+
+def get_fact_table(path: str, digest: str = None) -> FactTable:
+    """
+    Fact table of a stored document, computed once and cached with it.
+    """
+    digest = digest or digest_for_path(path)
+    return artifact_cache.get_or_build(
+        digest,
+        FACTS_ARTIFACT,
+        FactTable.load,
+        lambda: extract_facts(get_pages(path, digest)),
+        lambda table, f: table.dump(f),
+    )
+
+
+_text_facts = OrderedDict()
+_text_facts_lock = threading.Lock()
+TEXT_FACTS_CACHE_ENTRIES = 32
+
+
+def facts_for_text(text: str) -> FactTable:
+    """
+    Fact table of raw document text, memoized in-process by content hash.
+    """
+    key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    with _text_facts_lock:
+        if key in _text_facts:
+            _text_facts.move_to_end(key)
+            return _text_facts[key]
+
+    table = extract_facts(split_page_text(text))
+    with _text_facts_lock:
+        _text_facts[key] = table
+        while len(_text_facts) > TEXT_FACTS_CACHE_ENTRIES:
+            _text_facts.popitem(last=False)
+    return table
+
+
+def describe_facts(table: FactTable, pages=None, limit: int = 20) -> str:
+    """
+    Compact listing of the largest figures, with line context when pages are given.
+    """
+    if not len(table):
+        return "No matching figures found."
+
+    order = np.argsort(-np.abs(table.value))[:limit]
+    lines = [
+        f"{len(table)} figures; total {table.value.sum():,.2f}; "
+        f"max {table.value.max():,.2f}; min {table.value.min():,.2f}"
+    ]
+    for i in order:
+        currency = CURRENCIES[table.currency[i]] or "-"
+        entry = (
+            f"page {table.page[i]} | {format_period(table.period[i])} | "
+            f"{currency} {table.value[i]:,.2f}{'%' if table.percent[i] else ''}"
+        )
+        if pages is not None:
+            text = pages[table.page[i] - 1]
+            start = text.rfind("\n", 0, table.offset[i]) + 1
+            end = text.find("\n", table.offset[i])
+            context = text[start:end if end != -1 else len(text)].strip()
+            entry += f" | {context[:100]}"
+        lines.append(entry)
+    return "\n".join(lines)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from crewai.llms.base_llm import BaseLLM
+from crewai.utilities.events import crewai_event_bus, LLMCallCompletedEvent, LLMCallStartedEvent
+from crewai.utilities.events.llm_events import LLMCallType
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Simulated provider behaviour
+OFFLINE_LLM_LATENCY = float(os.getenv("OFFLINE_LLM_LATENCY", "0.5"))
+OFFLINE_LLM_TOKENS_PER_SECOND = float(os.getenv("OFFLINE_LLM_TOKENS_PER_SECOND", "250"))
+OFFLINE_LLM_ANSWER_TOKENS = int(os.getenv("OFFLINE_LLM_ANSWER_TOKENS", "400"))
+# Tool calls made before answering, so the tool paths run too
+OFFLINE_LLM_TOOL_CALLS = int(os.getenv("OFFLINE_LLM_TOOL_CALLS", "2"))
+
+CHARS_PER_TOKEN = 4
+
+TOOL_RE = re.compile(r"^Tool Name: (\S+)\nTool Arguments: (\{.*\})$", re.MULTILINE)
+TOOL_ARG_RE = re.compile(r"'(\w+)': \{'description': [^}]*'type': '(\w+)'\}")
+PATH_RE = re.compile(r"document at (\S+)")
+# Tool arguments that take the document (a path or its text)
+DOCUMENT_ARGUMENTS = ("path", "document_text")
+OBSERVATION_RE = re.compile(r"^Observation:", re.MULTILINE)
+
+# Sample values for tool arguments other than the document, by name then by type
+NAMED_ARGUMENT_VALUES = {"currency": "USD"}
+ARGUMENT_VALUES = {"str": "revenue profit risk outlook", "int": 5, "float": 0}
+
+ANSWER_SENTENCES = [
+    "Revenue trends and margins were reviewed against the prior period.",
+    "Liquidity remains adequate relative to short-term obligations.",
+    "Key risks include market volatility, credit exposure and execution.",
+    "Operating cash flow supports the current level of investment.",
+    "Guidance assumptions should be monitored against reported results.",
+]
+
+
+def _content(messages, skip_system: bool = False) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(
+        str(message.get("content", "")) for message in messages
+        if not (skip_system and message.get("role") == "system")
+    )
+
+
+# ------------------------
+# Deterministic offline LLM
+# ------------------------
+class OfflineLLM(BaseLLM):
+    """
+    Local stand-in for the Gemini LLM. Replies are a pure function of the
+    prompt: a fixed number of ReAct tool calls against the document, then a
+    final answer of OFFLINE_LLM_ANSWER_TOKENS tokens. Latency and token usage
+    are simulated and reported through the same callbacks and events as LLM.
+    """
+
+    def __init__(self, model: str = "offline/deterministic", temperature: float = None):
+        super().__init__(model=model, temperature=temperature)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, tools=tools))
+        prompt = _content(messages)
+        response = self._respond(prompt, _content(messages, skip_system=True))
+
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(response) // CHARS_PER_TOKEN
+        started = time.time()
+        time.sleep(OFFLINE_LLM_LATENCY + completion_tokens / OFFLINE_LLM_TOKENS_PER_SECOND)
+
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=None,
+        )
+        for callback in callbacks or []:
+            if hasattr(callback, "log_success_event"):
+                callback.log_success_event({}, {"usage": usage}, started, time.time())
+
+        crewai_event_bus.emit(
+            self, event=LLMCallCompletedEvent(response=response, call_type=LLMCallType.LLM_CALL)
+        )
+        return response
+
+    def _respond(self, prompt: str, conversation: str) -> str:
+        if "Final Answer:" not in prompt:
+            # Plain completion outside an agent loop (e.g. section summaries)
+            return self._answer(prompt)
+
+        tools = TOOL_RE.findall(prompt)
+        path = PATH_RE.search(prompt)
+        # The system prompt's format instructions mention Observation too
+        calls_made = len(OBSERVATION_RE.findall(conversation))
+
+        if path and calls_made < min(OFFLINE_LLM_TOOL_CALLS, len(tools)):
+            name, arguments = tools[calls_made]
+            tool_input = {}
+            for arg, arg_type in TOOL_ARG_RE.findall(arguments):
+                if arg in DOCUMENT_ARGUMENTS:
+                    tool_input[arg] = path.group(1)
+                else:
+                    tool_input[arg] = NAMED_ARGUMENT_VALUES.get(arg, ARGUMENT_VALUES.get(arg_type, ""))
+            return (
+                f"Thought: I should use {name} to gather evidence.\n"
+                f"Action: {name}\n"
+                f"Action Input: {json.dumps(tool_input)}"
+            )
+        return f"Thought: I now know the final answer\nFinal Answer: {self._answer(prompt)}"
+
+    def _answer(self, prompt: str) -> str:
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        words, sentences = 0, []
+        while words * 4 < OFFLINE_LLM_ANSWER_TOKENS * 3:
+            sentence = ANSWER_SENTENCES[(seed + len(sentences)) % len(ANSWER_SENTENCES)]
+            sentences.append(sentence)
+            words += len(sentence.split())
+        return f"[offline {seed:08x}] " + " ".join(sentences)
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
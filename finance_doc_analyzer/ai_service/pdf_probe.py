@@ -0,0 +1,52 @@
+import io
+import re
+
+OBJECT_RE = re.compile(rb"\d+\s+\d+\s+obj\b(.*?)\bendobj", re.DOTALL)
+PAGES_TYPE_RE = re.compile(rb"/Type\s*/Pages\b")
+COUNT_RE = re.compile(rb"/Count\s+(\d+)")
+
+
+def _tree_page_count(data):
+    # The root of the page tree counts every page below it
+    counts = [
+        int(count.group(1))
+        for body in OBJECT_RE.finditer(data)
+        if PAGES_TYPE_RE.search(body.group(1))
+        for count in [COUNT_RE.search(body.group(1))]
+        if count
+    ]
+    return max(counts) if counts else None
+
+
+def page_count(source, fallback: bool = True):
+    """
+    Number of pages of a PDF (a path, bytes or a buffer such as the mmap from
+    DocumentStore.open), read from the page tree without parsing any page.
+    Buffers are scanned in place, never copied. Falls back to pdfplumber when
+    the tree sits in a compressed object stream, unless fallback is False
+    (the API, which leaves full parses to the workers). Returns None for
+    unreadable files.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            count = _tree_page_count(f.read())
+    elif hasattr(source, "getbuffer"):
+        # BytesIO: a view of its contents rather than a copy
+        view = source.getbuffer()
+        try:
+            count = _tree_page_count(view)
+        finally:
+            view.release()
+    else:
+        count = _tree_page_count(source)
+    if count is not None or not fallback:
+        return count
+
+    import pdfplumber
+
+    try:
+        stream = source if isinstance(source, str) else io.BytesIO(bytes(source))
+        with pdfplumber.open(stream) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return None
@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+import redis
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+from celery_app import REDIS_URL
+from redis_client import get_redis
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "3600"))
+# Seconds between SSE keep-alive comments
+STREAM_HEARTBEAT = float(os.getenv("PROGRESS_STREAM_HEARTBEAT", "15"))
+STREAM_TIMEOUT = float(os.getenv("PROGRESS_STREAM_TIMEOUT", "900"))
+
+CHANNEL_PREFIX = "task-progress:"
+LAST_EVENT_PREFIX = "task-progress-last:"
+TERMINAL_EVENTS = {"result", "failed"}
+
+logger = logging.getLogger(__name__)
+
+# Task whose progress code running in this context reports to
+current_task_id = contextvars.ContextVar("current_task_id", default=None)
+_llm_calls = contextvars.ContextVar("llm_calls", default=None)
+
+
+# ------------------------
+# Publishing (workers)
+# ------------------------
+def publish(event: str, task_id: str = None, **data):
+    """
+    Push a progress event for the task over Redis pub/sub and remember it as
+    the task's latest event for clients that subscribe late. Best effort.
+    """
+    task_id = task_id or current_task_id.get()
+    if task_id is None:
+        return
+
+    payload = json.dumps(
+        {"task_id": task_id, "event": event, "time": time.time(), **data}, default=str
+    )
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(LAST_EVENT_PREFIX + task_id, payload, ex=PROGRESS_TTL)
+        pipe.publish(CHANNEL_PREFIX + task_id, payload)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not publish %s progress for task %s", event, task_id)
+
+
+def begin_task(task_id: str):
+    """
+    Attribute progress reported from this thread to task_id until end_task().
+    """
+    current_task_id.set(task_id)
+    _llm_calls.set([0])
+
+
+def end_task():
+    current_task_id.set(None)
+    _llm_calls.set(None)
+
+
+def llm_call_completed(**data):
+    """
+    Report one finished LLM round trip of the current task.
+    """
+    calls = _llm_calls.get()
+    if calls is None:
+        return
+    calls[0] += 1
+    publish("llm_call", call=calls[0], **data)
+
+
+def extraction_progress(pages_done: int, pages_total: int):
+    """
+    Report extraction progress, throttled to about twenty events per document.
+    """
+    step = max(1, pages_total // 20)
+    if pages_done == pages_total or pages_done % step == 0:
+        publish("extraction", pages_done=pages_done, pages_total=pages_total)
+
+
+# ------------------------
+# Streaming (API)
+# ------------------------
+def format_sse(payload: str) -> str:
+    event = json.loads(payload).get("event", "message")
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_progress(task_id: str, initial_state=None):
+    """
+    Yield server-sent events for a task until its result (or failure) lands.
+    initial_state is an optional blocking callable, run in a thread, that
+    returns a terminal payload for tasks that finished before any progress
+    was recorded.
+    """
+    client = aioredis.Redis.from_url(REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the last event so nothing slips in between
+        await pubsub.subscribe(CHANNEL_PREFIX + task_id)
+
+        last = await client.get(LAST_EVENT_PREFIX + task_id)
+        if last is None and initial_state is not None:
+            # A blocking result-backend read: keep it off the event loop
+            last = await asyncio.to_thread(initial_state)
+            last = last.encode() if isinstance(last, str) else last
+        if last is not None:
+            yield format_sse(last.decode())
+            if json.loads(last).get("event") in TERMINAL_EVENTS:
+                return
+
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=STREAM_HEARTBEAT)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            payload = message["data"].decode()
+            yield format_sse(payload)
+            if json.loads(payload).get("event") in TERMINAL_EVENTS:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
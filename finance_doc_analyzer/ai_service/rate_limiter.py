@@ -0,0 +1,145 @@
+import os
+from dotenv import load_dotenv
+from llm_config import LLM_MODEL, LLM_RPM_LIMIT, LLM_TPM_LIMIT
+from redis_client import get_redis
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Tokens reserved per expected request until the real usage is known
+LLM_TOKENS_PER_REQUEST = int(os.getenv("LLM_TOKENS_PER_REQUEST", "4000"))
+# Shortest delay before a task that could not get quota is retried
+MIN_RETRY_SECONDS = float(os.getenv("LLM_QUOTA_MIN_RETRY_SECONDS", "1"))
+
+BUCKET_PREFIX = "llm-rate:"
+
+# Two token buckets (requests, tokens) refilled continuously at limit/60 per
+# second up to one minute of capacity. Both are drawn from atomically: either
+# the whole reservation fits or nothing is taken and the wait is returned.
+# KEYS: request bucket, token bucket
+# ARGV: rpm, tpm, requests, tokens
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local costs = {tonumber(ARGV[3]), tonumber(ARGV[4])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or limits[i]
+    local ts = tonumber(state[2]) or now
+    level = math.min(limits[i], level + (now - ts) * limits[i] / 60)
+    levels[i] = level
+    if level < costs[i] then
+        wait = math.max(wait, (costs[i] - level) * 60 / limits[i])
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, 2 do
+    redis.call('HSET', KEYS[i], 'level', levels[i] - costs[i], 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 120)
+end
+return '0'
+"""
+
+# Give back (positive) or charge (negative) the difference between a
+# reservation and what was actually used. Levels may go negative, which makes
+# later reservations wait out the overspend.
+# KEYS: request bucket, token bucket
+# ARGV: rpm, tpm, request delta, token delta
+_ADJUST_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+for i = 1, 2 do
+    local limit = tonumber(ARGV[i])
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or limit
+    local ts = tonumber(state[2]) or now
+    level = math.min(limit, level + (now - ts) * limit / 60 + tonumber(ARGV[i + 2]))
+    redis.call('HSET', KEYS[i], 'level', level, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 120)
+end
+return 1
+"""
+
+
+class QuotaUnavailable(Exception):
+    """
+    Raised when the shared LLM quota cannot cover a reservation yet.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM quota exhausted; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+# ------------------------
+# Cluster-wide limiter
+# ------------------------
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one model, shared by
+    every worker through Redis. A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, model: str = LLM_MODEL, rpm: int = LLM_RPM_LIMIT, tpm: int = LLM_TPM_LIMIT):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.keys = [f"{BUCKET_PREFIX}{model}:requests", f"{BUCKET_PREFIX}{model}:tokens"]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    def _limits(self):
+        # A disabled bucket gets a capacity no reservation reaches
+        return [self.rpm or 10 ** 12, self.tpm or 10 ** 15]
+
+    def _clamp(self, requests: int, tokens: int):
+        # A reservation larger than a full bucket could never be granted
+        rpm, tpm = self._limits()
+        return min(requests, rpm), min(tokens, tpm)
+
+    def reserve(self, requests: int, tokens: int = None) -> dict:
+        """
+        Take quota for an upcoming crew run or raise QuotaUnavailable.
+        Returns the reservation to pass to reconcile().
+        """
+        if tokens is None:
+            tokens = requests * LLM_TOKENS_PER_REQUEST
+        reservation = {"requests": requests, "tokens": tokens}
+        if not self.enabled:
+            return reservation
+
+        requests, tokens = self._clamp(requests, tokens)
+        wait = float(get_redis().eval(_ACQUIRE_SCRIPT, 2, *self.keys, *self._limits(), requests, tokens))
+        if wait > 0:
+            raise QuotaUnavailable(max(wait, MIN_RETRY_SECONDS))
+        return {"requests": requests, "tokens": tokens}
+
+    def reconcile(self, reservation: dict, requests: int, tokens: int):
+        """
+        Settle a reservation against the requests and tokens actually used.
+        """
+        if not self.enabled:
+            return
+        get_redis().eval(
+            _ADJUST_SCRIPT, 2, *self.keys, *self._limits(),
+            reservation["requests"] - requests, reservation["tokens"] - tokens,
+        )
+
+
+rate_limiter = RateLimiter()
+
+
+def estimate_requests(agent) -> int:
+    """
+    LLM round trips a single-agent crew is expected to need: one per
+    iteration plus the final answer.
+    """
+    return (agent.max_iter or 1) + 1
@@ -0,0 +1,14 @@
+import redis
+from celery_app import REDIS_URL
+
+_client = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide Redis client (thread-safe, pooled connections).
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
@@ -0,0 +1,169 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dotenv import load_dotenv
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# One SQLite file shared by the API and the workers on a host (a shared volume
+# under Compose); results leave Redis after RESULT_TTL but stay here
+REPORT_ARCHIVE_PATH = os.getenv("REPORT_ARCHIVE_PATH", os.path.join("data", "archive", "reports.sqlite3"))
+# Seconds a writer waits for the database lock
+REPORT_ARCHIVE_TIMEOUT = float(os.getenv("REPORT_ARCHIVE_TIMEOUT", "5"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_by_document ON reports (digest, task_name, query_key, created_at);
+CREATE TABLE IF NOT EXISTS report_tasks (
+    task_id TEXT PRIMARY KEY,
+    report_key TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_tasks_by_report ON report_tasks (report_key);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _compress(result: dict) -> bytes:
+    return gzip.compress(json.dumps(result, default=str).encode("utf-8"))
+
+
+def _decompress(payload: bytes) -> dict:
+    return json.loads(gzip.decompress(payload))
+
+
+# ------------------------
+# Report archive
+# ------------------------
+class ReportArchive:
+    """
+    Persistent record of finished reports. A report is one crew result,
+    keyed like the LLM result cache (document, task, query, mode, model
+    settings) and stored gzipped; every task id that returned it maps to it.
+    Writes are best effort: an unavailable archive never fails a task.
+    """
+
+    def __init__(self, path: str = REPORT_ARCHIVE_PATH):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call: callers run on many threads and processes
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=REPORT_ARCHIVE_TIMEOUT)
+        if not self._initialized:
+            # WAL lets the API read while a worker writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._initialized = True
+        return connection
+
+    def store(self, report_key: str, digest: str, task_name: str, query: str, query_key: str,
+              mode: str, result: dict, task_id: str = None):
+        """
+        Archive a freshly produced report (replacing an older one under the
+        same key) and link task_id to it.
+        """
+        now = time.time()
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (report_key, digest, task_name, query, query_key, mode, now, _compress(result)),
+                )
+                if task_id:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO report_tasks VALUES (?, ?, ?)", (task_id, report_key, now)
+                    )
+        except sqlite3.Error:
+            logger.warning("Could not archive report %s", report_key, exc_info=True)
+
+    def link_task(self, task_id: str, report_key: str):
+        """
+        Record that task_id returned the already archived report_key.
+        """
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO report_tasks VALUES (?, ?, ?)", (task_id, report_key, time.time())
+                )
+        except sqlite3.Error:
+            logger.warning("Could not link task %s to report %s", task_id, report_key, exc_info=True)
+
+    def task_results(self, task_ids: list) -> dict:
+        """
+        {task_id: result} for the given task ids that have an archived report.
+        """
+        if not task_ids:
+            return {}
+        results = {}
+        try:
+            with closing(self._connect()) as connection:
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(task_ids), 500):
+                    ids = task_ids[start:start + 500]
+                    rows = connection.execute(
+                        "SELECT t.task_id, r.payload FROM report_tasks t"
+                        " JOIN reports r ON r.report_key = t.report_key"
+                        f" WHERE t.task_id IN ({', '.join('?' * len(ids))})",
+                        ids,
+                    )
+                    results.update((task_id, _decompress(payload)) for task_id, payload in rows)
+        except sqlite3.Error:
+            logger.warning("Could not read archived results", exc_info=True)
+        return results
+
+    def list_reports(self, digest: str, task_name: str = None, query_key: str = None,
+                     limit: int = 50, include_result: bool = False) -> list:
+        """
+        Reports archived for a document, newest first, optionally filtered by
+        task and normalized query.
+        """
+        clauses, params = ["digest = ?"], [digest]
+        if task_name:
+            clauses.append("task_name = ?")
+            params.append(task_name)
+        if query_key is not None:
+            clauses.append("query_key = ?")
+            params.append(query_key)
+        columns = "report_key, task_name, query, mode, created_at" + (", payload" if include_result else "")
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT {columns} FROM reports WHERE {' AND '.join(clauses)}"
+                " ORDER BY created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+        reports = []
+        for row in rows:
+            report = {
+                "report_key": row[0],
+                "task_name": row[1],
+                "query": row[2],
+                "mode": row[3],
+                "created_at": row[4],
+            }
+            if include_result:
+                report["result"] = _decompress(row[5])
+            reports.append(report)
+        return reports
+
+
+report_archive = ReportArchive()
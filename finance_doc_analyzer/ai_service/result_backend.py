@@ -0,0 +1,40 @@
+import gzip
+import os
+from celery.backends.redis import RedisBackend
+from dotenv import load_dotenv
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Payloads smaller than this (pending/started states, chord counters) are
+# not worth compressing
+RESULT_COMPRESS_MIN_BYTES = int(os.getenv("RESULT_COMPRESS_MIN_BYTES", "512"))
+RESULT_COMPRESS_LEVEL = int(os.getenv("RESULT_COMPRESS_LEVEL", "6"))
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+# ------------------------
+# Compressed Redis result backend
+# ------------------------
+class CompressedRedisBackend(RedisBackend):
+    """
+    Redis result backend that gzips large payloads. Reports are mostly
+    prose, so they shrink several times over. Uncompressed payloads (small
+    ones, and any written before compression was enabled) still decode.
+    Selected in celery_app.py as result_backend:CompressedRedisBackend+redis://...
+    """
+
+    def encode(self, data):
+        payload = super().encode(data)
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if len(payload) < RESULT_COMPRESS_MIN_BYTES:
+            return payload
+        return gzip.compress(payload, compresslevel=RESULT_COMPRESS_LEVEL)
+
+    def decode(self, payload):
+        if isinstance(payload, bytes) and payload[:2] == GZIP_MAGIC:
+            payload = gzip.decompress(payload)
+        return super().decode(payload)
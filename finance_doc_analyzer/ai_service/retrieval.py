@@ -0,0 +1,187 @@
+import os
+import re
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from dotenv import load_dotenv
+from document_cache import artifact_cache, digest_for_path, get_pages
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1500"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "3000"))
+# Rough chars-per-token ratio used to keep results inside the budget
+CHARS_PER_TOKEN = 4
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+INDEX_ARTIFACT = "chunk_index.npz"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+
+# ------------------------
+# Chunking
+# ------------------------
+def chunk_pages(pages, chunk_chars: int = RETRIEVAL_CHUNK_CHARS):
+    """
+    Split each page into paragraph-sized chunks on line boundaries. Chunks
+    never cross pages. Returns parallel lists of (page index, start, end).
+    """
+    chunk_page, chunk_start, chunk_end = [], [], []
+    for page_index, text in enumerate(pages):
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_chars, len(text))
+            if end < len(text):
+                # Prefer to cut at the last line break inside the window
+                newline = text.rfind("\n", start, end)
+                if newline > start:
+                    end = newline + 1
+            chunk_page.append(page_index)
+            chunk_start.append(start)
+            chunk_end.append(end)
+            start = end
+    return chunk_page, chunk_start, chunk_end
+
+
+# ------------------------
+# BM25 chunk index
+# ------------------------
+class ChunkIndex:
+    """
+    BM25 index over the chunks of one document. Term weights are precomputed
+    into a sparse chunk x term matrix, so a query is a column sum.
+    """
+
+    def __init__(self, weights, terms, chunk_page, chunk_start, chunk_end):
+        self.weights = weights.tocsc()
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.chunk_page = np.asarray(chunk_page, dtype=np.int32)
+        self.chunk_start = np.asarray(chunk_start, dtype=np.int64)
+        self.chunk_end = np.asarray(chunk_end, dtype=np.int64)
+
+    @classmethod
+    def build(cls, pages):
+        chunk_page, chunk_start, chunk_end = chunk_pages(pages)
+
+        vocabulary = {}
+        rows, cols, counts, lengths = [], [], [], []
+        for chunk_id, (page_index, start, end) in enumerate(zip(chunk_page, chunk_start, chunk_end)):
+            tokens = tokenize(pages[page_index][start:end])
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                rows.append(chunk_id)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+
+        n_chunks, n_terms = len(chunk_page), len(vocabulary)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        tf = np.asarray(counts, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.float32)
+
+        df = np.bincount(cols, minlength=n_terms).astype(np.float32)
+        idf = np.log1p((n_chunks - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if n_chunks and lengths.mean() > 0 else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg_length)
+        data = idf[cols] * tf * (BM25_K1 + 1) / (tf + norm)
+
+        weights = sparse.csr_matrix((data, (rows, cols)), shape=(n_chunks, n_terms), dtype=np.float32)
+        terms = [None] * n_terms
+        for term, i in vocabulary.items():
+            terms[i] = term
+        return cls(weights, terms, chunk_page, chunk_start, chunk_end)
+
+    def dump(self, f):
+        weights = self.weights.tocsr()
+        np.savez(
+            f,
+            data=weights.data,
+            indices=weights.indices,
+            indptr=weights.indptr,
+            shape=np.asarray(weights.shape),
+            terms=np.asarray(self.terms, dtype=str),
+            chunk_page=self.chunk_page,
+            chunk_start=self.chunk_start,
+            chunk_end=self.chunk_end,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            weights = sparse.csr_matrix(
+                (npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"])
+            )
+            return cls(
+                weights,
+                npz["terms"].tolist(),
+                npz["chunk_page"],
+                npz["chunk_start"],
+                npz["chunk_end"],
+            )
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K):
+        """
+        Return [(chunk_id, score)] for the best-matching chunks, best first.
+        """
+        term_ids = sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary})
+        if not term_ids or self.weights.shape[0] == 0:
+            return []
+
+        scores = np.asarray(self.weights[:, term_ids].sum(axis=1)).ravel()
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
+
+
+def get_chunk_index(path: str, digest: str = None) -> ChunkIndex:
+    """
+    Return the chunk index of a document, building and persisting it on first use.
+    """
+    digest = digest or digest_for_path(path)
+    return artifact_cache.get_or_build(
+        digest,
+        INDEX_ARTIFACT,
+        ChunkIndex.load,
+        lambda: ChunkIndex.build(get_pages(path, digest)),
+        lambda index, f: index.dump(f),
+    )
+
+
+def retrieve_chunks(path: str, query: str, top_k: int = RETRIEVAL_TOP_K,
+                    token_budget: int = RETRIEVAL_TOKEN_BUDGET) -> list:
+    """
+    Return the top-k chunks for query as dicts (page, score, text), trimmed
+    to fit within token_budget.
+    """
+    digest = digest_for_path(path)
+    index = get_chunk_index(path, digest)
+    pages = get_pages(path, digest)
+
+    results = []
+    remaining_chars = token_budget * CHARS_PER_TOKEN
+    for chunk_id, score in index.search(query, top_k):
+        page_index = int(index.chunk_page[chunk_id])
+        text = pages[page_index][index.chunk_start[chunk_id]:index.chunk_end[chunk_id]].strip()
+        if not text:
+            continue
+        if len(text) > remaining_chars:
+            if results:
+                break
+            text = text[:remaining_chars]
+        results.append({"page": page_index + 1, "score": score, "text": text})
+        remaining_chars -= len(text)
+        if remaining_chars <= 0:
+            break
+    return results
@@ -0,0 +1,166 @@
+import logging
+import math
+import os
+import time
+from functools import lru_cache
+from dotenv import load_dotenv
+from celery_app import (
+    BULK_QUEUE, FAST_QUEUE, PRIORITY_LEVELS, STANDARD_QUEUE, TASK_QUEUES, priority_list
+)
+from document_store import get_document_store
+from pdf_probe import page_count
+from redis_client import get_redis
+from task_client import (
+    AGGREGATE_RESULTS_TASK, MAP_REDUCE_TASKS, MODE_AUTO, MODE_FULL, MODE_MAP_REDUCE, PREPARE_DOCUMENT_TASK,
+    VERIFY_TASK,
+)
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Lanes, in page-equivalents of work (pages x task weight) and document bytes
+FAST_MAX_PAGES = float(os.getenv("FAST_QUEUE_MAX_PAGES", "10"))
+FAST_MAX_BYTES = int(os.getenv("FAST_QUEUE_MAX_BYTES", str(2 * 1024 * 1024)))
+BULK_MIN_PAGES = float(os.getenv("BULK_QUEUE_MIN_PAGES", "150"))
+BULK_MIN_BYTES = int(os.getenv("BULK_QUEUE_MIN_BYTES", str(20 * 1024 * 1024)))
+# A task that waited this long at its priority level moves up one level, so
+# big jobs climb to the front of their queue instead of starving
+QUEUE_AGING_SECONDS = float(os.getenv("QUEUE_AGING_SECONDS", "60"))
+QUEUE_AGING_MAX_MOVES = int(os.getenv("QUEUE_AGING_MAX_MOVES", "100"))
+# Documents this long run in map-reduce mode when the request asks for "auto"
+MAP_REDUCE_MIN_PAGES = int(os.getenv("MAP_REDUCE_MIN_PAGES", "80"))
+
+# Used when the page count cannot be read cheaply
+BYTES_PER_PAGE = 50 * 1024
+
+# Relative work per page: verification reads less than the analyses, and
+# preparing a document is one extraction
+TASK_WEIGHTS = {
+    VERIFY_TASK: 0.5,
+    PREPARE_DOCUMENT_TASK: 0.5,
+    AGGREGATE_RESULTS_TASK: 0.0,
+}
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# Classification (API)
+# ------------------------
+@lru_cache(maxsize=4096)
+def document_profile(digest: str) -> tuple:
+    """
+    (bytes, pages) of a stored document, scanning the store's buffer in
+    place. pages is None when the page tree sits in a compressed object
+    stream: such documents are routed by size, and only a worker ever
+    parses them. Documents never change, so profiles are cached.
+    """
+    with get_document_store().open(digest) as buffer:
+        buffer.seek(0, os.SEEK_END)
+        size = buffer.tell()
+        buffer.seek(0)
+        return size, page_count(buffer, fallback=False)
+
+
+def estimated_pages(digest: str) -> float:
+    """
+    Page count of a stored document, estimated from its size when the page
+    tree cannot be read cheaply. The API and workers get the same number.
+    """
+    size, pages = document_profile(digest)
+    return pages if pages is not None else size / BYTES_PER_PAGE
+
+
+def route_for(task_name: str, digest: str) -> dict:
+    """
+    Queue and priority for running task_name on a document, as options for
+    Signature.set(). Lanes are chosen by the work the task implies; within
+    a lane, priority falls by one level each time that work doubles.
+    """
+    size, _ = document_profile(digest)
+    work = estimated_pages(digest) * TASK_WEIGHTS.get(task_name, 1.0)
+
+    if work <= FAST_MAX_PAGES and size <= FAST_MAX_BYTES:
+        queue = FAST_QUEUE
+    elif work >= BULK_MIN_PAGES or size >= BULK_MIN_BYTES:
+        queue = BULK_QUEUE
+    else:
+        queue = STANDARD_QUEUE
+    priority = min(PRIORITY_LEVELS - 1, int(math.log2(max(work, 1.0))))
+    return {"queue": queue, "priority": priority}
+
+
+# ------------------------
+# Analysis mode (API and workers)
+# ------------------------
+def use_map_reduce(mode: str, digest: str) -> bool:
+    """
+    Whether a run in the requested mode summarizes the document first. Auto
+    decides from the page count profiled at ingest, so the API can resolve
+    it without extracting anything.
+    """
+    if mode == MODE_AUTO:
+        return estimated_pages(digest) >= MAP_REDUCE_MIN_PAGES
+    return mode == MODE_MAP_REDUCE
+
+
+def resolve_mode(mode: str, task_name: str, digest: str) -> str:
+    """
+    The mode a task actually runs in: map_reduce or full. Results are keyed
+    on it, so an auto request shares results with the explicit mode it
+    resolves to.
+    """
+    if task_name in MAP_REDUCE_TASKS and use_map_reduce(mode, digest):
+        return MODE_MAP_REDUCE
+    return MODE_FULL
+
+
+# ------------------------
+# Aging (beat)
+# ------------------------
+# Move the oldest messages of one priority list to the serving end of the
+# next level up while they have waited QUEUE_AGING_SECONDS for every level
+# climbed so far plus this one.
+# KEYS: source list, destination list
+# ARGV: now, aging seconds, source level, max moves
+_AGE_SCRIPT = """
+local moved = 0
+while moved < tonumber(ARGV[4]) do
+    local raw = redis.call('LINDEX', KEYS[1], -1)
+    if not raw then break end
+    local ok, message = pcall(cjson.decode, raw)
+    if not ok then break end
+    local published = tonumber((message['headers'] or {})['published_at'])
+    local original = tonumber((message['properties'] or {})['priority']) or tonumber(ARGV[3])
+    if not published then break end
+    local climbed = math.max(0, original - tonumber(ARGV[3]))
+    if tonumber(ARGV[1]) - published < (climbed + 1) * tonumber(ARGV[2]) then break end
+    redis.call('RPUSH', KEYS[2], redis.call('RPOP', KEYS[1]))
+    moved = moved + 1
+end
+return moved
+"""
+
+
+def age_queues(now: float = None) -> dict:
+    """
+    Promote long-waiting messages in every queue by one priority level.
+    Returns {queue: messages promoted}.
+    """
+    now = now or time.time()
+    client = get_redis()
+    promoted = {}
+    for queue in TASK_QUEUES:
+        moved = 0
+        # Level 1 first: a message promoted into a level is not seen again
+        # until the next run, so it climbs at most one level per run
+        for level in range(1, PRIORITY_LEVELS):
+            moved += client.eval(
+                _AGE_SCRIPT, 2, priority_list(queue, level), priority_list(queue, level - 1),
+                now, QUEUE_AGING_SECONDS, level, QUEUE_AGING_MAX_MOVES,
+            )
+        promoted[queue] = moved
+    if any(promoted.values()):
+        logger.info("Promoted waiting tasks: %s", promoted)
+    return promoted
@@ -0,0 +1,118 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Everything written to local disk besides the document store lands here:
+# cached extractions, derived artifacts and copies spilled for path-only readers
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR", os.path.join("data", "cache"))
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Rescan the directory at least this often to see other workers' writes
+SCRATCH_RESCAN_SECONDS = float(os.getenv("SCRATCH_RESCAN_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+# ------------------------
+# Quota-bounded scratch area
+# ------------------------
+class ScratchArea:
+    """
+    Disk space shared by all workers on a host, one directory per document
+    (root/ab/abcd...). Entries are touched when read; once the total size
+    passes max_bytes, whole entries are evicted least recently used first.
+    Everything in it can be rebuilt, so eviction only costs recomputation.
+    """
+
+    def __init__(self, root: str = DOCUMENT_CACHE_DIR, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._estimate = None
+        self._scanned_at = 0.0
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def touch(self, key: str):
+        """
+        Mark an entry as recently used.
+        """
+        try:
+            os.utime(self.entry_dir(key))
+        except OSError:
+            pass
+
+    def _entries(self) -> list:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for fan_out in os.scandir(self.root):
+            if not fan_out.is_dir():
+                continue
+            for entry in os.scandir(fan_out.path):
+                if entry.is_dir():
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.name, _dir_size(entry.path)))
+                    except OSError:
+                        pass
+        return entries
+
+    def record_write(self, key: str, size: int):
+        """
+        Account for size bytes written under key and evict if over quota.
+        """
+        self.touch(key)
+        with self._lock:
+            stale = time.monotonic() - self._scanned_at > SCRATCH_RESCAN_SECONDS
+            if self._estimate is not None and not stale:
+                self._estimate += size
+                if self._estimate <= self.max_bytes:
+                    return
+            self._estimate = self.evict(keep=key)
+            self._scanned_at = time.monotonic()
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Remove least recently used entries until under quota. Returns the
+        bytes left in use.
+        """
+        entries = sorted(self._entries())
+        used = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if used <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            used -= size
+            logger.info("Evicted scratch entry %s (%d bytes)", key, size)
+        return used
+
+    def usage(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, _, size in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+scratch_area = ScratchArea()
@@ -0,0 +1,170 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
+from crewai.utilities.token_counter_callback import TokenCalcHandler
+from document_cache import artifact_cache, artifact_path, digest_for_path, get_pages
+from llm_config import llm_settings
+from rate_limiter import rate_limiter
+import metrics
+import progress
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Pages are grouped into sections of at most this much text (~6k tokens)
+SUMMARY_SECTION_CHARS = int(os.getenv("SUMMARY_SECTION_CHARS", "24000"))
+SUMMARY_WORDS = int(os.getenv("SUMMARY_WORDS", "250"))
+# Section summaries in flight at once per worker process, across all tasks
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+# Bump when the prompt changes so cached summaries are rebuilt
+SUMMARY_PROMPT_VERSION = 1
+# Rough chars-per-token ratio used to size the quota reservation
+CHARS_PER_TOKEN = 4
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You summarize one section of a financial filing for an analyst who will "
+    "not read the original. Keep every reported figure with its period and "
+    "currency, guidance, risk factors and anything unusual. No preamble."
+)
+
+
+# ------------------------
+# Sections
+# ------------------------
+def split_sections(pages, max_chars: int = SUMMARY_SECTION_CHARS) -> list:
+    """
+    Group consecutive pages into sections of at most max_chars of text.
+    Returns [(first page index, stop page index)]; a page longer than
+    max_chars is a section on its own.
+    """
+    sections = []
+    start, size = 0, 0
+    for index, text in enumerate(pages):
+        if index > start and size + len(text) > max_chars:
+            sections.append((start, index))
+            start, size = index, 0
+        size += len(text)
+    if start < len(pages):
+        sections.append((start, len(pages)))
+    return sections
+
+
+def section_prompt(pages, start: int, stop: int) -> list:
+    text = "".join(
+        f"--- Page {index + 1} ---\n{pages[index]}\n" for index in range(start, stop)
+    )[:SUMMARY_SECTION_CHARS]
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"Summarize pages {start + 1}-{stop} in at most {SUMMARY_WORDS} words.\n\n{text}",
+        },
+    ]
+
+
+def _artifact_name() -> str:
+    # Summaries depend on the model settings as well as the document
+    material = json.dumps(
+        [llm_settings(), SUMMARY_SECTION_CHARS, SUMMARY_WORDS, SUMMARY_PROMPT_VERSION], sort_keys=True
+    )
+    return f"section_summaries_{hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+# ------------------------
+# Map step
+# ------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY, thread_name_prefix="summary")
+        return _executor
+
+
+def summarize_sections(llm, pages) -> list:
+    """
+    Summarize every section of a document, SUMMARY_CONCURRENCY calls at a
+    time, so the wall time is set by the slowest sections rather than the
+    document length. Quota for all calls is reserved up front and settled
+    against the tokens used; raises QuotaUnavailable like a crew run.
+    Returns [{"first_page", "last_page", "summary"}] in page order.
+    """
+    sections = split_sections(pages)
+    prompts = [section_prompt(pages, start, stop) for start, stop in sections]
+    prompt_tokens = sum(len(message["content"]) for prompt in prompts for message in prompt) // CHARS_PER_TOKEN
+    reservation = rate_limiter.reserve(len(prompts), prompt_tokens + len(prompts) * SUMMARY_WORDS * 2)
+
+    usage = TokenProcess()
+    done = [0]
+    done_lock = threading.Lock()
+
+    def summarize(prompt):
+        summary = llm.call(prompt, callbacks=[TokenCalcHandler(usage)])
+        with done_lock:
+            done[0] += 1
+            progress.publish("summaries", sections_done=done[0], sections_total=len(prompts))
+        return summary.strip()
+
+    executor = _get_executor()
+    try:
+        with metrics.task_stage("summaries"):
+            # Each call runs in a copy of this context so progress and metrics
+            # are attributed to the calling task
+            futures = [
+                executor.submit(contextvars.copy_context().run, summarize, prompt) for prompt in prompts
+            ]
+            summaries = [future.result() for future in futures]
+    finally:
+        totals = usage.get_summary()
+        rate_limiter.reconcile(reservation, totals.successful_requests, totals.total_tokens)
+        metrics.record_tokens(totals.prompt_tokens, totals.completion_tokens)
+
+    return [
+        {"first_page": start + 1, "last_page": stop, "summary": summary}
+        for (start, stop), summary in zip(sections, summaries)
+    ]
+
+
+def _load_summaries(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_section_summaries(path: str, digest: str = None, llm=None):
+    """
+    Section summaries of a document, cached with it so every later query on
+    the same filing reuses them. Without an llm, returns None unless they
+    are already cached.
+    """
+    digest = digest or digest_for_path(path)
+    name = _artifact_name()
+    if llm is None and not os.path.exists(artifact_path(digest, name)):
+        return None
+    return artifact_cache.get_or_build(
+        digest,
+        name,
+        _load_summaries,
+        lambda: summarize_sections(llm, get_pages(path, digest)),
+        lambda summaries, f: f.write(json.dumps(summaries, ensure_ascii=False).encode("utf-8")),
+    )
+
+
+def format_summaries(summaries) -> str:
+    """
+    Render section summaries in the layout handed to the agents.
+    """
+    return "".join(
+        f"--- Pages {section['first_page']}-{section['last_page']} ---\n{section['summary']}\n"
+        for section in summaries
+    )
@@ -0,0 +1,294 @@
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from document_cache import artifact_cache, digest_for_path, get_pages
+from extraction import map_page_ranges, open_pdf
+from numeric_facts import PAGE_SCALE_RE, SCALE_EXPONENTS
+
+TABLES_ARTIFACT = "tables_v2.arrow"
+
+# Long (cell-per-row) columnar layout: one Arrow IPC file holds every table of a document
+TABLE_SCHEMA = pa.schema([
+    ("table_id", pa.int32()),
+    ("page", pa.int32()),
+    ("row", pa.int32()),
+    ("col", pa.int16()),
+    ("label", pa.string()),
+    ("header", pa.string()),
+    ("text", pa.string()),
+    ("value", pa.float64()),
+    ("scale", pa.int8()),
+])
+
+# Sign, currency and parentheses in any of the orders statements print them:
+# -1,234  $-1,234  (1,234)  $(1,234)  ($1,234)  (12.5%)  12.5%
+NUMBER_RE = re.compile(
+    r"^(?P<open>\()?(?P<sign>-)?(?:US\$|[$€£])?(?P<open_inner>\()?(?P<sign_inner>-)?"
+    r"(?P<number>\d{1,3}(?:,\d{3})+|\d+)(?P<fraction>\.\d+)?"
+    r"(?P<percent>%)?(?P<close>\))?(?P<percent_outer>%)?$"
+)
+HEADER_YEAR_RE = re.compile(r"(20\d{2}|19\d{2})")
+QUARTER_HEADER_RE = re.compile(r"Q([1-4])", re.IGNORECASE)
+
+# Statement line items used for the KPIs, matched against row labels
+LINE_ITEMS = {
+    "revenue": r"^(total )?(net )?(revenues?|sales)\b",
+    "cost_of_revenue": r"^(total )?cost of (revenues?|sales|goods sold)\b",
+    "gross_profit": r"^gross (profit|margin)\b",
+    "operating_income": r"^(income|loss|income \(loss\)) from operations\b|^operating (income|profit)\b",
+    "net_income": r"^net (income|profit|earnings|loss)\b",
+    "total_assets": r"^total assets\b",
+    "total_liabilities": r"^total liabilities\s*$",
+    "total_equity": r"^total (stockholders'?|shareholders'?)? ?equity\b",
+    "operating_cash_flow": r"^net cash provided by (\(used in\) )?operating activities\b",
+}
+
+
+def _match_number(cell: str):
+    if not cell:
+        return None
+    match = NUMBER_RE.match(cell.strip().replace(" ", ""))
+    if not match:
+        return None
+    # Parentheses must pair up, and only one pair may enclose the number
+    opened = bool(match.group("open")) + bool(match.group("open_inner"))
+    if opened != bool(match.group("close")) or (match.group("percent") and match.group("percent_outer")):
+        return None
+    return match
+
+
+def parse_number(cell: str):
+    """
+    Parse a statement cell such as '1,234', '$ 56.7', '(1,234)' or
+    '$(1,234)' into a float; accounting parentheses make it negative.
+    """
+    match = _match_number(cell)
+    if not match:
+        return None
+    value = float((match.group("number") + (match.group("fraction") or "")).replace(",", ""))
+    if match.group("sign") or match.group("sign_inner") or match.group("close"):
+        value = -value
+    return value
+
+
+def is_percent(cell: str) -> bool:
+    match = _match_number(cell)
+    return bool(match and (match.group("percent") or match.group("percent_outer")))
+
+
+def _clean(cell) -> str:
+    return " ".join((cell or "").split())
+
+
+def _is_header_row(row) -> bool:
+    """
+    A header row carries labels or period years, not amounts.
+    """
+    return all(parse_number(cell) is None or HEADER_YEAR_RE.fullmatch(cell) for cell in row[1:])
+
+
+# ------------------------
+# Ingest: pdfplumber tables -> Arrow columns
+# ------------------------
+def extract_page_tables(source: str, start: int, stop: int) -> list:
+    """
+    Cleaned table rows of pages [start, stop) (0-based): for each page, a
+    list of tables, each a list of rows. Runs inside pool workers too.
+    """
+    with open_pdf(source, pages=range(start + 1, stop + 1)) as pdf:
+        page_tables = []
+        for page in pdf.pages:
+            try:
+                tables = page.extract_tables()
+            finally:
+                page.close()
+            page_tables.append([
+                [[_clean(cell) for cell in row] for row in rows if any(row)] for rows in tables
+            ])
+        return page_tables
+
+
+def extract_tables(path: str, digest: str = None) -> pa.Table:
+    """
+    Detect tables on every page and flatten them into the long columnar layout.
+    The first row of a table is its header when it holds no amounts. Values
+    are scaled to units by the page's 'in millions' style header, recorded
+    in the scale column (percentages are never scaled). Page text comes
+    from the page cache; table detection is sharded across the extraction
+    pool for long documents.
+    """
+    pages = get_pages(path, digest)
+    page_tables = map_page_ranges(path, extract_page_tables, page_count=len(pages))
+
+    columns = {field.name: [] for field in TABLE_SCHEMA}
+    table_id = 0
+    for page_num, (page_text, tables) in enumerate(zip(pages, page_tables), start=1):
+        page_scale = PAGE_SCALE_RE.search(page_text)
+        page_exponent = SCALE_EXPONENTS[page_scale.group(1).lower()] if page_scale else 0
+
+        for rows in tables:
+            if not rows:
+                continue
+            header = [""] * len(rows[0])
+            if _is_header_row(rows[0]):
+                header, rows = rows[0], rows[1:]
+
+            for row_num, row in enumerate(rows):
+                label = row[0] if row else ""
+                for col, cell in enumerate(row[1:], start=1):
+                    value = parse_number(cell)
+                    scale = 0 if value is None or is_percent(cell) else page_exponent
+                    columns["table_id"].append(table_id)
+                    columns["page"].append(page_num)
+                    columns["row"].append(row_num)
+                    columns["col"].append(col)
+                    columns["label"].append(label)
+                    columns["header"].append(header[col] if col < len(header) else "")
+                    columns["text"].append(cell)
+                    columns["value"].append(value * 10 ** scale if value is not None else None)
+                    columns["scale"].append(scale)
+            table_id += 1
+
+    return pa.Table.from_pydict(columns, schema=TABLE_SCHEMA)
+
+
+def dump_tables(table: pa.Table, f):
+    with pa.ipc.new_file(f, TABLE_SCHEMA) as writer:
+        writer.write_table(table)
+
+
+def load_tables(path: str) -> pa.Table:
+    """
+    Memory-map the Arrow file so concurrent readers share the OS page cache.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def get_tables(path: str, digest: str = None) -> pa.Table:
+    """
+    Columnar tables of a stored document, extracted once and cached with it.
+    """
+    digest = digest or digest_for_path(path)
+    return artifact_cache.get_or_build(
+        digest,
+        TABLES_ARTIFACT,
+        load_tables,
+        lambda: extract_tables(path, digest),
+        dump_tables,
+    )
+
+
+# ------------------------
+# KPIs over the columns
+# ------------------------
+def _period_key(header: str):
+    year = HEADER_YEAR_RE.search(header or "")
+    quarter = QUARTER_HEADER_RE.search(header or "")
+    if not year:
+        return None
+    return int(year.group(1)) * 10 + (int(quarter.group(1)) if quarter else 0)
+
+
+def line_item_series(tables: pa.Table, item: str) -> dict:
+    """
+    {period header: value} for the first table row whose label matches a line item.
+    """
+    cells = tables.filter(
+        pc.and_(
+            pc.match_substring_regex(tables["label"], LINE_ITEMS[item], ignore_case=True),
+            pc.is_valid(tables["value"]),
+        )
+    )
+    if cells.num_rows == 0:
+        return {}
+
+    first = cells.slice(0, 1).to_pylist()[0]
+    row = cells.filter(
+        pc.and_(
+            pc.equal(cells["table_id"], first["table_id"]),
+            pc.equal(cells["row"], first["row"]),
+        )
+    )
+    headers = row["header"].to_pylist()
+    values = row["value"].to_numpy(zero_copy_only=False)
+    return {header or f"col {col}": value
+            for header, col, value in zip(headers, row["col"].to_pylist(), values)}
+
+
+def _ordered_periods(series: dict):
+    """
+    Period headers most recent first, or None when the headers do not name
+    distinct periods and their order is therefore unknown.
+    """
+    headers = list(series)
+    keys = [_period_key(h) for h in headers]
+    if None in keys or len(set(keys)) != len(keys):
+        return None
+    return [h for _, h in sorted(zip(keys, headers), reverse=True)]
+
+
+def compute_kpis(tables: pa.Table) -> dict:
+    """
+    Margins, growth and leverage ratios computed per period over the table columns.
+    """
+    series = {item: line_item_series(tables, item) for item in LINE_ITEMS}
+    kpis = {}
+
+    def ratio(name, numerator, denominator):
+        # Ratios pair columns by header, so printed order will do
+        ordered = _ordered_periods(series[denominator]) or list(series[denominator])
+        periods = [p for p in ordered if p in series[numerator]]
+        if not periods:
+            return
+        num = np.array([series[numerator][p] for p in periods])
+        den = np.array([series[denominator][p] for p in periods])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(den != 0, num / den, np.nan)
+        kpis[name] = dict(zip(periods, values.tolist()))
+
+    def growth(name, item):
+        # Growth needs to know which column is the later period
+        periods = _ordered_periods(series[item])
+        if periods is None or len(periods) < 2:
+            return
+        values = np.array([series[item][p] for p in periods])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(values[1:] != 0, (values[:-1] - values[1:]) / np.abs(values[1:]), np.nan)
+        kpis[name] = {f"{periods[i]} vs {periods[i + 1]}": change[i] for i in range(len(change))}
+
+    ratio("gross_margin", "gross_profit", "revenue")
+    ratio("operating_margin", "operating_income", "revenue")
+    ratio("net_margin", "net_income", "revenue")
+    ratio("debt_ratio", "total_liabilities", "total_assets")
+    ratio("debt_to_equity", "total_liabilities", "total_equity")
+    ratio("cash_conversion", "operating_cash_flow", "net_income")
+    growth("revenue_growth", "revenue")
+    growth("net_income_growth", "net_income")
+
+    kpis["line_items"] = {item: values for item, values in series.items() if values}
+    return kpis
+
+
+def describe_kpis(kpis: dict, table_count: int) -> str:
+    """
+    Compact text rendering of the KPIs for the LLM.
+    """
+    if not kpis.get("line_items"):
+        return f"{table_count} tables detected; no standard statement line items found."
+
+    lines = [f"{table_count} tables detected."]
+    lines.append("Line items:")
+    for item, values in kpis["line_items"].items():
+        shown = ", ".join(f"{period}: {value:,.2f}" for period, value in values.items())
+        lines.append(f"- {item}: {shown}")
+    lines.append("Metrics:")
+    for name, values in kpis.items():
+        if name == "line_items":
+            continue
+        shown = ", ".join(
+            f"{period}: {value:.1%}" if np.isfinite(value) else f"{period}: n/a"
+            for period, value in values.items()
+        )
+        lines.append(f"- {name}: {shown}")
+    return "\n".join(lines)
@@ -1,6 +1,11 @@
 from crewai import Task
-from agents import financial_analyst, investment_advisor, risk_assessor, verifier
-from tools import FinancialDocumentTool, InvestmentTool, RiskTool, DocumentVerifierTool
+from tools import (
+    FinancialDocumentTool, DocumentSearchTool, FinancialFiguresTool, FinancialMetricsTool,
+    InvestmentTool, RiskTool, DocumentVerifierTool
+)
+
+# Tasks are templates: crews.py binds them to the agents built in each worker
+# process.
 
 # ------------------------
 # 1. Financial Document Analysis
@@ -14,8 +19,12 @@ analyze_financial_document = Task(
     Goal: Deliver a comprehensive, structured, and actionable financial analysis.
 
     Steps:
-    1. Extract key financial statements, metrics, and data points using FinancialDocumentTool.
-    2. Analyze revenue, profit, margins, growth rates, and other KPIs.
+    1. Extract key financial statements, metrics, and data points. Use DocumentSearchTool
+       to fetch the passages relevant to each question; read the full text with
+       FinancialDocumentTool only when the passages are not enough.
+    2. Analyze revenue, profit, margins, growth rates, and other KPIs
+       (FinancialMetricsTool computes statement KPIs; FinancialFiguresTool lists the
+       reported figures by page, period and currency).
     3. Identify trends, anomalies, and notable patterns.
     4. Provide insights supported by the document.
     5. Contextualize metrics against industry benchmarks and market standards.
@@ -40,8 +49,12 @@ analyze_financial_document = Task(
     7. Market Context              # Benchmarks, industry comparisons, macroeconomic considerations.
     8. Conclusion                  # Final summary with actionable next steps or recommendations.
     """,
-    agent=financial_analyst,
-    tools=[FinancialDocumentTool()],
+    tools=[
+        DocumentSearchTool(),
+        FinancialFiguresTool(),
+        FinancialMetricsTool(),
+        FinancialDocumentTool(),
+    ],
     async_execution=False,
 )
 
@@ -55,8 +68,9 @@ investment_analysis = Task(
     User Query: {query}
 
     Steps:
-    1. Extract relevant financial data.
-    2. Calculate key KPIs: revenue growth, profitability, ROE, debt ratios.
+    1. Extract relevant financial data (DocumentSearchTool returns the relevant passages).
+    2. Calculate key KPIs: revenue growth, profitability, ROE, debt ratios
+       (start from the precomputed FinancialMetricsTool output).
     3. Conduct SWOT analysis (strengths, weaknesses, opportunities, threats).
     4. Compare performance with peers or industry benchmarks.
     5. Assess valuation: under/over/fairly valued.
@@ -80,8 +94,12 @@ investment_analysis = Task(
     - Recommendation: Buy/Hold/Sell # Clear investment action with rationale and targets.
     - Risk Considerations       # Risks tied to the investment decision and possible mitigations.
     """,
-    agent=investment_advisor,
-    tools=[InvestmentTool()],
+    tools=[
+        InvestmentTool(),
+        DocumentSearchTool(),
+        FinancialFiguresTool(),
+        FinancialMetricsTool(),
+    ],
     async_execution=False,
 )
 
@@ -95,7 +113,7 @@ risk_assessment = Task(
     User Query: {query}
 
     Steps:
-    1. Extract document content and relevant financial data.
+    1. Extract document content and relevant financial data (DocumentSearchTool returns the relevant passages).
     2. Identify risks: financial, operational, market, regulatory.
     3. Classify each risk by severity (High / Medium / Low).
     4. Assess potential impact and suggest mitigation strategies.
@@ -117,8 +135,12 @@ risk_assessment = Task(
     - Mitigation Strategies                     # Suggested ways to monitor, reduce, or manage risks.
     - Watchlist Metrics                         # Key KPIs to track for ongoing risk monitoring.
     """,
-    agent=risk_assessor,
-    tools=[RiskTool()],
+    tools=[
+        RiskTool(),
+        DocumentSearchTool(),
+        FinancialFiguresTool(),
+        FinancialMetricsTool(),
+    ],
     async_execution=False,
 )
 
@@ -156,7 +178,83 @@ verification = Task(
     - Observations         # Notes on anomalies, missing info, or unusual patterns.
     - Recommendations      # Next steps (e.g., request updated report, proceed with analysis).
     """,
-    agent=verifier,
-    tools=[DocumentVerifierTool()],
+    tools=[DocumentVerifierTool(), DocumentSearchTool()],
+    async_execution=False,
+)
+
+# ------------------------
+# Map-reduce variants (analysis and risk)
+# ------------------------
+# The document arrives as section summaries built in parallel beforehand
+# (summaries.py), so the agent covers all of it within max_iter and only
+# searches the full text for detail.
+analyze_financial_document_map_reduce = Task(
+    description="""
+    You are a senior financial analyst. Analyze the financial document at: {path}
+
+    User Query: {query}
+
+    The document is long; it has been summarized section by section:
+
+    {summaries}
+
+    Goal: Deliver a comprehensive, structured, and actionable financial analysis.
+
+    Steps:
+    1. Work from the section summaries above; they cover the whole document.
+    2. Use DocumentSearchTool for exact passages and figures the summaries only mention
+       (FinancialMetricsTool computes statement KPIs; FinancialFiguresTool lists the
+       reported figures by page, period and currency).
+    3. Analyze revenue, profit, margins, growth rates, and other KPIs.
+    4. Identify trends, anomalies, and notable patterns across sections.
+    5. Contextualize metrics against industry benchmarks and market standards.
+    6. Include actionable investment guidance and high-level risk considerations.
+    7. Structure the report professionally with headings, bullet points, and bold keywords.
+
+    Requirements:
+    - Quote exact figures where possible, citing the pages they come from.
+    - Clearly note missing or inconsistent data.
+    - Maintain a professional, investor-ready tone.
+    - Include an executive summary (3-4 lines).
+    """,
+    expected_output=analyze_financial_document.expected_output,
+    tools=[
+        DocumentSearchTool(),
+        FinancialFiguresTool(),
+        FinancialMetricsTool(),
+    ],
+    async_execution=False,
+)
+
+risk_assessment_map_reduce = Task(
+    description="""
+    Conduct a detailed risk review of the financial document at: {path}
+
+    User Query: {query}
+
+    The document is long; it has been summarized section by section:
+
+    {summaries}
+
+    Steps:
+    1. Work from the section summaries above; they cover the whole document.
+    2. Identify risks: financial, operational, market, regulatory.
+    3. Use DocumentSearchTool for the exact passages behind each significant risk.
+    4. Classify each risk by severity (High / Medium / Low).
+    5. Assess potential impact and suggest mitigation strategies.
+    6. Present findings clearly with headings, bullet points, and tables if needed.
+
+    Requirements:
+    - Quote exact figures where applicable, citing the pages they come from.
+    - Highlight missing or unusual data.
+    - Provide actionable, investor-ready recommendations.
+    """,
+    expected_output=risk_assessment.expected_output,
+    tools=[
+        RiskTool(),
+        DocumentSearchTool(),
+        FinancialFiguresTool(),
+        FinancialMetricsTool(),
+    ],
     async_execution=False,
 )
@@ -0,0 +1,65 @@
+from celery import chain, chord, group
+from celery_app import celery_app
+
+# ------------------------
+# Task names
+# ------------------------
+# Registered names of the tasks in celery_tasks.py. The API enqueues by name,
+# so it never imports CrewAI, the tools or the agents.
+ANALYZE_TASK = "celery_tasks.analyze_financial_document_task"
+INVESTMENT_TASK = "celery_tasks.investment_analysis_task"
+RISK_TASK = "celery_tasks.risk_assessment_task"
+VERIFY_TASK = "celery_tasks.verification_task"
+PREPARE_DOCUMENT_TASK = "celery_tasks.prepare_document_task"
+AGGREGATE_RESULTS_TASK = "celery_tasks.aggregate_results_task"
+
+
+# ------------------------
+# Analysis modes
+# ------------------------
+# "full" lets the agent read the document itself; "map_reduce" first
+# summarizes it section by section and has the agent reason over the
+# summaries; "auto" picks map_reduce for long documents (see routing.py).
+MODE_AUTO = "auto"
+MODE_FULL = "full"
+MODE_MAP_REDUCE = "map_reduce"
+ANALYSIS_MODES = (MODE_AUTO, MODE_FULL, MODE_MAP_REDUCE)
+# Tasks with a map-reduce variant; the others always run in full
+MAP_REDUCE_TASKS = (ANALYZE_TASK, RISK_TASK)
+
+
+# ------------------------
+# Signatures
+# ------------------------
+def analysis_task(task_name: str, query: str, filename: str, digest: str, use_cache: bool = True,
+                  mode: str = MODE_AUTO):
+    """
+    Immutable signature of one crew task.
+    """
+    return celery_app.signature(
+        task_name, args=(query, filename, digest), kwargs={"use_cache": use_cache, "mode": mode}, immutable=True
+    )
+
+
+def build_analyze_all(query_by_type, filename, digest, task_names_by_type, use_cache=True, mode=MODE_AUTO,
+                      route=None):
+    """
+    Canvas for a full report: prepare the document (and its section
+    summaries, in map-reduce mode), run every crew concurrently against the
+    shared extraction, then aggregate the results. route(task_name), if
+    given, returns the queue options of each step (see routing.py).
+    """
+    def routed(signature):
+        return signature.set(**route(signature.task)) if route else signature
+
+    task_types = list(query_by_type)
+    crews = group(
+        routed(analysis_task(
+            task_names_by_type[task_type], query_by_type[task_type], filename, digest, use_cache, mode
+        ))
+        for task_type in task_types
+    )
+    return chain(
+        routed(celery_app.signature(PREPARE_DOCUMENT_TASK, args=(digest,), kwargs={"mode": mode}, immutable=True)),
+        chord(crews, routed(celery_app.signature(AGGREGATE_RESULTS_TASK, args=(task_types,)))),
+    )
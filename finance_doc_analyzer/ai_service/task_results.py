@@ -0,0 +1,118 @@
+import json
+from celery.result import AsyncResult
+from celery_app import celery_app
+from redis_client import get_redis
+from report_archive import report_archive
+
+BATCH_KEY_PREFIX = "batch:"
+
+
+# ------------------------
+# Task state -> API status
+# ------------------------
+def describe_task(task_id: str, state: str, result=None) -> dict:
+    """
+    Response body for a task in the given Celery state, as served by /result.
+    """
+    if state == "PENDING":
+        return {"task_id": task_id, "status": "pending"}
+    elif state == "STARTED":
+        return {"task_id": task_id, "status": "running"}
+    elif state == "SUCCESS":
+        return {"task_id": task_id, "status": "success", "result": result}
+    elif state == "FAILURE":
+        return {"task_id": task_id, "status": "failed", "error": str(result)}
+    else:
+        return {"task_id": task_id, "status": state}
+
+
+def task_status(task_id: str) -> dict:
+    result = AsyncResult(task_id, app=celery_app)
+    if result.state == "PENDING":
+        # Unknown to Redis: not run yet, or its result expired into the archive
+        archived = report_archive.task_results([task_id])
+        if task_id in archived:
+            return describe_task(task_id, "SUCCESS", archived[task_id])
+    return describe_task(task_id, result.state, result.result)
+
+
+def task_statuses(task_ids: list) -> list:
+    """
+    Status of many tasks from a single MGET of their result-backend keys,
+    in the order given. Ids missing from Redis are looked up in the report
+    archive in one query; the rest read as pending, like AsyncResult.
+    """
+    if not task_ids:
+        return []
+
+    backend = celery_app.backend
+    raw_metas = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    missing = [task_id for task_id, raw in zip(task_ids, raw_metas) if raw is None]
+    archived = report_archive.task_results(missing)
+
+    statuses = []
+    for task_id, raw in zip(task_ids, raw_metas):
+        if raw is None:
+            if task_id in archived:
+                statuses.append(describe_task(task_id, "SUCCESS", archived[task_id]))
+            else:
+                statuses.append(describe_task(task_id, "PENDING"))
+            continue
+        meta = backend.decode_result(raw)
+        statuses.append(describe_task(task_id, meta["status"], meta.get("result")))
+    return statuses
+
+
+# ------------------------
+# Conditional GET
+# ------------------------
+# A finished task's status never changes, so its ETag can be checked without
+# reading the result; other states change only with the status itself
+FINAL_STATUSES = ("success", "failed")
+
+
+def status_etag(task_id: str, status: str) -> str:
+    return f'"{task_id}.{status}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def final_etag_match(task_id: str, if_none_match: str):
+    """
+    The ETag of a finished task that if_none_match already holds, or None.
+    """
+    for status in FINAL_STATUSES:
+        etag = status_etag(task_id, status)
+        if etag_matches(if_none_match, etag):
+            return etag
+    return None
+
+
+def summarize_statuses(statuses: list) -> dict:
+    """
+    Count of tasks per status, e.g. {"success": 10, "pending": 2}.
+    """
+    counts = {}
+    for status in statuses:
+        counts[status["status"]] = counts.get(status["status"], 0) + 1
+    return counts
+
+
+# ------------------------
+# Batch manifests
+# ------------------------
+def save_batch(batch_id: str, tasks: list):
+    """
+    Record the tasks of a batch for as long as their results are kept.
+    """
+    get_redis().set(BATCH_KEY_PREFIX + batch_id, json.dumps(tasks), ex=celery_app.backend.expires)
+
+
+def load_batch(batch_id: str):
+    raw = get_redis().get(BATCH_KEY_PREFIX + batch_id)
+    return json.loads(raw) if raw is not None else None
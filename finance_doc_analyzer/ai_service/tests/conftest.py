@@ -0,0 +1,32 @@
+"""
+Service modules are flat and read their settings at import time, so the
+test session points them at a fakeredis server (served over TCP, with Lua,
+as in the load harness) and a scratch data directory before any of them
+loads. Requires the extras in benchmarks/requirements.txt.
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.load import start_fake_redis  # noqa: E402
+
+WORKDIR = tempfile.mkdtemp(prefix="fda-tests-")
+os.environ["REDIS_URL"] = start_fake_redis()
+os.environ["WORKER_METRICS_PORT"] = "0"
+os.environ["DOCUMENT_STORE_DIR"] = os.path.join(WORKDIR, "store")
+os.environ["DOCUMENT_CACHE_DIR"] = os.path.join(WORKDIR, "cache")
+os.environ["REPORT_ARCHIVE_PATH"] = os.path.join(WORKDIR, "archive", "reports.sqlite3")
+
+
+@pytest.fixture
+def redis_db():
+    from redis_client import get_redis
+
+    client = get_redis()
+    client.flushdb()
+    yield client
+    client.flushdb()
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only workers may load: CrewAI and the PDF/LLM stack behind it
+WORKER_ONLY_MODULES = ("crewai", "litellm", "pdfplumber", "extraction", "document_cache", "summaries")
+
+
+def test_api_does_not_import_crewai():
+    # A fresh interpreter, since this session may have loaded them already.
+    # The result goes out by exit status and raw fd: CrewAI wraps sys.stdout.
+    code = (
+        "import os, sys, main\n"
+        f"loaded = [name for name in {WORKER_ONLY_MODULES!r} if name in sys.modules]\n"
+        "os.write(1, ','.join(loaded).encode())\n"
+        "os._exit(1 if loaded else 0)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True)
+    assert (result.returncode, result.stdout) == (0, "")
@@ -0,0 +1,57 @@
+import pytest
+from document_store import DocumentStore, LocalDocumentStore, compute_digest
+
+
+class MemoryDocumentStore(DocumentStore):
+    # The smallest backend: the base class supplies writer, open and local_path
+    def __init__(self):
+        self.documents = {}
+
+    def put(self, data: bytes) -> str:
+        digest = compute_digest(data)
+        self.documents.setdefault(digest, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self.documents[digest]
+
+    def exists(self, digest: str) -> bool:
+        return digest in self.documents
+
+
+def test_backends_must_implement_put_get_exists():
+    class Partial(DocumentStore):
+        def put(self, data: bytes) -> str:
+            return compute_digest(data)
+
+    with pytest.raises(TypeError):
+        DocumentStore()
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.fixture(params=["memory", "local"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDocumentStore()
+    return LocalDocumentStore(str(tmp_path))
+
+
+def test_store_round_trip(store):
+    data = b"%PDF-1.4 sample" * 1000
+
+    with store.writer() as writer:
+        for start in range(0, len(data), 4096):
+            writer.write(data[start:start + 4096])
+        digest = writer.commit()
+
+    assert digest == compute_digest(data) == store.put(data)
+    assert store.exists(digest) and not store.exists(compute_digest(b"other"))
+    assert store.get(digest) == data
+    buffer = store.open(digest)
+    try:
+        assert buffer.read() == data
+    finally:
+        buffer.close()
+    with open(store.local_path(digest), "rb") as f:
+        assert f.read() == data
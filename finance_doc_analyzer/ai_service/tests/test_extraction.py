@@ -0,0 +1,63 @@
+import pdfplumber
+import pytest
+from benchmarks.corpus import synthetic_report
+from document_store import document_handle, get_document_store
+import extraction
+from extraction import extract_pages, format_pages
+
+
+def baseline_extract_pdf_text(path: str) -> str:
+    # The single-process extract_pdf_text from tools.py before sharding
+    full_text = ""
+    with pdfplumber.open(path) as pdf:
+        for page_num, page in enumerate(pdf.pages):
+            content = page.extract_text() or ""
+            content = content.replace("\n\n", "\n")
+            full_text += f"--- Page {page_num + 1} ---\n{content}\n"
+    return full_text
+
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory):
+    data = synthetic_report(pages=12, table_density=0.3, seed=3)
+    path = tmp_path_factory.mktemp("extraction") / "report.pdf"
+    path.write_bytes(data)
+    return str(path), data
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Shard even a short document across two processes, a few pages each
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(extraction, "PARALLEL_EXTRACTION_MIN_PAGES", 1)
+    monkeypatch.setattr(extraction, "EXTRACTION_SHARD_PAGES", 3)
+    yield
+    extraction._reset_pool()
+
+
+def test_serial_extraction_matches_baseline(report, monkeypatch):
+    path, _ = report
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 1)
+
+    assert format_pages(extract_pages(path)) == baseline_extract_pdf_text(path)
+
+
+def test_sharded_extraction_matches_baseline(report, parallel):
+    path, _ = report
+    expected = baseline_extract_pdf_text(path)
+
+    # Straight through the pool, so a silent serial fallback cannot pass
+    pages = extraction._map_ranges_parallel(extraction.extract_page_range, path, 12)
+    assert format_pages(pages) == expected
+
+    seen = []
+    assert format_pages(extract_pages(path, lambda done, total: seen.append((done, total)))) == expected
+    assert seen[-1] == (12, 12)
+
+
+def test_sharded_extraction_from_store_matches_baseline(report, parallel):
+    path, data = report
+    handle = document_handle(get_document_store().put(data))
+
+    assert format_pages(extract_pages(handle)) == baseline_extract_pdf_text(path)
+    assert list(extraction.iter_pages(handle)) == extract_pages(path)
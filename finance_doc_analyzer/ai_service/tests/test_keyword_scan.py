@@ -0,0 +1,123 @@
+from extraction import format_pages
+from keyword_scan import (
+    FINANCIAL_SECTIONS, KEY_TERMS, NEGATIVE_WORDS, RISK_KEYWORDS, KeywordScanner, normalize_text, scanner
+)
+
+ALL_TERMS = RISK_KEYWORDS + NEGATIVE_WORDS + FINANCIAL_SECTIONS + KEY_TERMS
+
+# Overlaps the scanner has to report the way substring checks do: terms inside
+# longer terms ('risk' in 'market risk', 'loss' in 'profit & loss'), terms
+# inside words ('assets' in 'assetsheet'), shared terms across keyword sets
+# ('cash flow') and terms that only exist after double spaces are collapsed
+PAGES = [
+    "Annual Report 2024\nMarket Risk and CREDIT risk are discussed below.",
+    "Profit & Loss for the year; the income  statement shows a decline.",
+    "Statement of Operations: revenue of $120 million, operational riskier bets.",
+    "Cash Flow and the balance sheet; total assetsheet items and equity.",
+    "",
+    "Financial Risk and exposure: uncertainty, volatility, a deficit, a decrease.",
+]
+
+
+def substring_checks(pages, terms=ALL_TERMS) -> list:
+    # What the tools did before the scanner: one `in` check per keyword
+    text = normalize_text(format_pages(pages))
+    return [term for term in terms if term in text]
+
+
+def test_scan_finds_what_substring_checks_find():
+    scan = scanner.scan_pages(PAGES)
+
+    for terms in (RISK_KEYWORDS, NEGATIVE_WORDS, FINANCIAL_SECTIONS, KEY_TERMS):
+        assert scan.found(terms) == substring_checks(PAGES, terms)
+    assert scan.text_length == len(normalize_text(format_pages(PAGES)).strip())
+    assert scan.has_pattern("year") and scan.has_pattern("currency")
+
+
+def test_scan_counts_overlapping_matches_per_page():
+    scan = scanner.scan_pages(PAGES)
+
+    text_by_page = [normalize_text(page) for page in PAGES]
+    for term in ALL_TERMS:
+        expected = sum(text.count(term) for text in text_by_page)
+        assert scan.counts.get(term, 0) == expected, term
+        assert scan.pages.get(term, []) == [
+            page_num for page_num, text in enumerate(text_by_page, start=1) if term in text
+        ]
+
+
+def test_scan_matches_substring_checks_on_every_prefix_of_the_document():
+    for stop in range(len(PAGES) + 1):
+        assert scanner.scan_pages(PAGES[:stop]).found(ALL_TERMS) == substring_checks(PAGES[:stop])
+
+
+def test_scanner_counts_nested_terms_like_str_count():
+    terms = ["risk", "risk factor", "factor"]
+    pages = ["risk factors and risk", "no match here", "RISK FACTOR"]
+    scan = KeywordScanner(terms).scan_pages(pages)
+
+    assert scan.counts == {term: sum(page.lower().count(term) for page in pages) for term in terms}
+    assert scan.counts == {"risk": 3, "risk factor": 2, "factor": 2}
+
+
+class RecordingPages:
+    """
+    Page iterator that records how far it was read and whether it was closed.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.read == len(self.pages):
+            raise StopIteration
+        self.read += 1
+        return self.pages[self.read - 1]
+
+    def close(self):
+        self.closed = True
+
+
+def verified(scan) -> bool:
+    # DocumentVerifierTool's checks, as in tools.verification_passed
+    return (
+        scan.text_length >= 150
+        and bool(scan.found(FINANCIAL_SECTIONS))
+        and scan.has_pattern("year")
+        and scan.has_pattern("currency")
+    )
+
+
+def test_scan_stops_once_satisfied_partway_through():
+    pages = RecordingPages(PAGES)
+    scan = scanner.scan_pages_until(pages, verified)
+
+    # Page 3 brings the first currency amount and the text past 150 chars
+    assert (scan.complete, scan.page_count, pages.read, pages.closed) == (False, 3, 3, True)
+    assert scan.found(ALL_TERMS) == substring_checks(PAGES[:3])
+    assert scan.text_length == len(normalize_text(format_pages(PAGES[:3])).strip())
+    assert not verified(scanner.scan_pages(PAGES[:2]))
+
+
+def test_unsatisfied_scan_reads_everything_like_a_full_scan():
+    pages = RecordingPages(PAGES)
+    scan = scanner.scan_pages_until(pages, lambda scan: False)
+    full = scanner.scan_pages(PAGES)
+
+    assert (scan.complete, pages.read, pages.closed) == (True, len(PAGES), True)
+    assert (scan.counts, scan.pages, scan.patterns, scan.text_length) == (
+        full.counts, full.pages, full.patterns, full.text_length
+    )
+
+
+def test_scan_respects_page_budget():
+    scan = scanner.scan_pages_until(RecordingPages(PAGES), lambda scan: False, max_pages=2)
+
+    assert (scan.complete, scan.page_count) == (False, 2)
+    assert scan.found(ALL_TERMS) == substring_checks(PAGES[:2])
+    assert scan.patterns == {"year": [1], "currency": []}
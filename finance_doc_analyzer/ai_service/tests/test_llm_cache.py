@@ -0,0 +1,35 @@
+import pytest
+from llm_cache import INFLIGHT_PREFIX, LLM_CACHE_INFLIGHT_TTL, claim_inflight, refresh_inflight, release_inflight
+
+
+def test_claim_coalesces_until_released(redis_db):
+    assert claim_inflight("key", "first") is None
+    assert claim_inflight("key", "second") == "first"
+
+    release_inflight("key", "second")
+    assert claim_inflight("key", "third") == "first"
+    release_inflight("key", "first")
+    assert claim_inflight("key", "third") is None
+
+
+def test_deferred_run_keeps_its_claim_past_the_countdown(redis_db):
+    claim_inflight("key", "deferred")
+
+    refresh_inflight("key", "deferred", 1800)
+    assert redis_db.ttl(INFLIGHT_PREFIX + "key") == pytest.approx(1800 + LLM_CACHE_INFLIGHT_TTL, abs=2)
+    assert claim_inflight("key", "duplicate") == "deferred"
+
+
+def test_refresh_reclaims_an_expired_claim(redis_db):
+    refresh_inflight("key", "deferred", 60)
+
+    assert claim_inflight("key", "duplicate") == "deferred"
+
+
+def test_refresh_leaves_another_runs_claim_alone(redis_db):
+    claim_inflight("key", "other")
+    redis_db.expire(INFLIGHT_PREFIX + "key", 30)
+
+    refresh_inflight("key", "deferred", 1800)
+    assert claim_inflight("key", "duplicate") == "other"
+    assert redis_db.ttl(INFLIGHT_PREFIX + "key") <= 30
@@ -0,0 +1,21 @@
+from numeric_facts import extract_facts
+
+PAGES = [
+    "Q2 2025 results (in millions)\nRevenue $1,200 and EUR 300; margin 18%.",
+    "Debt of £2.5 billion and $(40) thousand in fees.",
+]
+
+
+def test_query_filters_by_currency():
+    table = extract_facts(PAGES)
+
+    assert table.query(currency="usd").value.tolist() == [1.2e9, -4e4]
+    assert table.query(currency="EUR").value.tolist() == [3e8]
+    assert table.query(currency="GBP", first_page=2).value.tolist() == [2.5e9]
+
+
+def test_query_with_unknown_currency_selects_nothing():
+    table = extract_facts(PAGES)
+
+    assert len(table.query(currency="JPY")) == 0
+    assert len(table.query(currency="JPY", min_value=0)) == 0
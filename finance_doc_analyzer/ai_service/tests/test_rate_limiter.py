@@ -0,0 +1,63 @@
+import pytest
+from rate_limiter import QuotaUnavailable, RateLimiter
+
+
+def levels(client, limiter: RateLimiter) -> list:
+    return [float(client.hget(key, "level")) for key in limiter.keys]
+
+
+def test_reserve_draws_from_both_buckets(redis_db):
+    limiter = RateLimiter(model="test", rpm=10, tpm=1000)
+
+    assert limiter.reserve(2, 300) == {"requests": 2, "tokens": 300}
+    requests, tokens = levels(redis_db, limiter)
+    # Refill since the reservation is well under one request/token
+    assert requests == pytest.approx(8, abs=0.1)
+    assert tokens == pytest.approx(700, abs=5)
+
+
+def test_reserve_takes_nothing_when_either_bucket_is_short(redis_db):
+    limiter = RateLimiter(model="test", rpm=10, tpm=1000)
+    limiter.reserve(2, 300)
+
+    # Requests fit, tokens do not: 300 short at 1000/min is an 18 s wait
+    with pytest.raises(QuotaUnavailable) as raised:
+        limiter.reserve(1, 1000)
+    assert raised.value.retry_after == pytest.approx(18, abs=0.5)
+    assert levels(redis_db, limiter) == pytest.approx([8, 700], abs=5)
+
+
+def test_reconcile_returns_unused_quota(redis_db):
+    limiter = RateLimiter(model="test", rpm=10, tpm=1000)
+    reservation = limiter.reserve(4, 800)
+
+    limiter.reconcile(reservation, requests=1, tokens=100)
+    assert levels(redis_db, limiter) == pytest.approx([9, 900], abs=5)
+    # The returned quota is available again at once
+    limiter.reserve(9, 900)
+
+
+def test_reconcile_charges_overspend(redis_db):
+    limiter = RateLimiter(model="test", rpm=10, tpm=1000)
+    reservation = limiter.reserve(1, 500)
+
+    limiter.reconcile(reservation, requests=1, tokens=1200)
+    assert levels(redis_db, limiter)[1] == pytest.approx(-200, abs=5)
+    # Overspend is waited out: 200 below zero plus 100 wanted at 1000/min
+    with pytest.raises(QuotaUnavailable) as raised:
+        limiter.reserve(1, 100)
+    assert raised.value.retry_after == pytest.approx(18, abs=0.5)
+
+
+def test_oversized_reservation_is_clamped_to_bucket_capacity(redis_db):
+    limiter = RateLimiter(model="test", rpm=10, tpm=1000)
+
+    assert limiter.reserve(50, 5000) == {"requests": 10, "tokens": 1000}
+
+
+def test_disabled_limiter_never_touches_redis(redis_db):
+    limiter = RateLimiter(model="test", rpm=0, tpm=0)
+
+    assert limiter.reserve(100, 10 ** 9) == {"requests": 100, "tokens": 10 ** 9}
+    limiter.reconcile({"requests": 100, "tokens": 10 ** 9}, 1, 1)
+    assert redis_db.keys("llm-rate:*") == []
@@ -0,0 +1,71 @@
+import json
+from celery_app import STANDARD_QUEUE, celery_app, priority_list
+from routing import QUEUE_AGING_SECONDS, age_queues
+from task_client import ANALYZE_TASK
+import metrics  # noqa: F401  (stamps published_at on every published message)
+
+
+def publish(priority: int) -> str:
+    result = celery_app.send_task(
+        ANALYZE_TASK, args=("query", "a.pdf", "0" * 64), queue=STANDARD_QUEUE, priority=priority
+    )
+    return result.id
+
+
+def message_ids(client, queue: str, level: int) -> list:
+    # Oldest (next served) last, as kombu pushes left and pops right
+    return [json.loads(raw)["headers"]["id"] for raw in client.lrange(priority_list(queue, level), 0, -1)]
+
+
+def published_at(client, queue: str, level: int) -> float:
+    return json.loads(client.lindex(priority_list(queue, level), -1))["headers"]["published_at"]
+
+
+def test_messages_land_in_kombu_priority_lists(redis_db):
+    task_id = publish(3)
+    assert message_ids(redis_db, STANDARD_QUEUE, 3) == [task_id]
+
+    message = json.loads(redis_db.lindex(priority_list(STANDARD_QUEUE, 3), -1))
+    assert message["properties"]["priority"] == 3
+    assert message["headers"]["published_at"] > 0
+
+
+def test_no_promotion_before_aging_period(redis_db):
+    task_id = publish(3)
+    published = published_at(redis_db, STANDARD_QUEUE, 3)
+
+    assert age_queues(now=published + QUEUE_AGING_SECONDS - 1)[STANDARD_QUEUE] == 0
+    assert message_ids(redis_db, STANDARD_QUEUE, 3) == [task_id]
+
+
+def test_promotes_one_level_per_aging_period(redis_db):
+    task_id = publish(3)
+    published = published_at(redis_db, STANDARD_QUEUE, 3)
+
+    # Long overdue, yet a single run moves it up one level only
+    assert age_queues(now=published + 10 * QUEUE_AGING_SECONDS)[STANDARD_QUEUE] == 1
+    assert message_ids(redis_db, STANDARD_QUEUE, 3) == []
+    assert message_ids(redis_db, STANDARD_QUEUE, 2) == [task_id]
+
+    # Having climbed once, it needs to have waited two periods to climb again
+    assert age_queues(now=published + 2 * QUEUE_AGING_SECONDS - 1)[STANDARD_QUEUE] == 0
+    assert age_queues(now=published + 2 * QUEUE_AGING_SECONDS + 1)[STANDARD_QUEUE] == 1
+    assert message_ids(redis_db, STANDARD_QUEUE, 1) == [task_id]
+
+
+def test_promoted_message_is_served_first_at_level_zero(redis_db):
+    aged = publish(1)
+    published = published_at(redis_db, STANDARD_QUEUE, 1)
+    fresh = publish(0)
+
+    assert age_queues(now=published + QUEUE_AGING_SECONDS + 1)[STANDARD_QUEUE] == 1
+    # Level 0 is the bare queue name; the promoted message sits at the serving end
+    assert message_ids(redis_db, STANDARD_QUEUE, 0) == [fresh, aged]
+
+
+def test_top_level_is_never_aged(redis_db):
+    task_id = publish(0)
+    published = published_at(redis_db, STANDARD_QUEUE, 0)
+
+    assert age_queues(now=published + 100 * QUEUE_AGING_SECONDS)[STANDARD_QUEUE] == 0
+    assert message_ids(redis_db, STANDARD_QUEUE, 0) == [task_id]
@@ -0,0 +1,71 @@
+import pyarrow as pa
+import pytest
+from benchmarks.corpus import synthetic_report
+from tables import TABLE_SCHEMA, compute_kpis, extract_tables, parse_number
+
+
+@pytest.mark.parametrize("cell, value", [
+    ("1,234", 1234.0),
+    ("$ 56.7", 56.7),
+    ("(1,234)", -1234.0),
+    ("$(1,234)", -1234.0),
+    ("$ (1,234)", -1234.0),
+    ("($1,234)", -1234.0),
+    ("€(300)", -300.0),
+    ("-$1,234", -1234.0),
+    ("$-1,234", -1234.0),
+    ("(12.5%)", -12.5),
+    ("US$1,000", 1000.0),
+    ("(1,234", None),
+    ("1,234)", None),
+    ("n/a", None),
+    ("", None),
+])
+def test_parse_number(cell, value):
+    assert parse_number(cell) == value
+
+
+def statement(headers, rows) -> pa.Table:
+    # One table in the long layout, as extract_tables builds it
+    columns = {field.name: [] for field in TABLE_SCHEMA}
+    for row_num, (label, values) in enumerate(rows):
+        for col, (header, value) in enumerate(zip(headers, values), start=1):
+            for name, item in (("table_id", 0), ("page", 1), ("row", row_num), ("col", col), ("label", label),
+                               ("header", header), ("text", str(value)), ("value", value), ("scale", 0)):
+                columns[name].append(item)
+    return pa.Table.from_pydict(columns, schema=TABLE_SCHEMA)
+
+
+def test_growth_follows_the_years_not_the_printed_order():
+    kpis = compute_kpis(statement(["2023", "2024"], [("Total revenues", [100.0, 150.0])]))
+
+    assert kpis["revenue_growth"] == {"2024 vs 2023": pytest.approx(0.5)}
+
+
+@pytest.mark.parametrize("headers", [
+    ["Current", "Prior"],
+    ["2024", "Prior year"],
+    ["Three months 2024", "Nine months 2024"],
+])
+def test_growth_is_skipped_when_period_order_is_unknown(headers):
+    kpis = compute_kpis(statement(headers, [
+        ("Total revenues", [150.0, 100.0]),
+        ("Gross profit", [60.0, 30.0]),
+    ]))
+
+    assert "revenue_growth" not in kpis
+    # Ratios pair columns by header and need no order
+    assert kpis["gross_margin"] == {headers[0]: pytest.approx(0.4), headers[1]: pytest.approx(0.3)}
+
+
+def test_extracted_values_are_scaled_to_units(tmp_path):
+    path = tmp_path / "statements.pdf"
+    path.write_bytes(synthetic_report(pages=1, table_density=1.0, seed=1))
+
+    tables = extract_tables(str(path)).to_pylist()
+    amounts = [cell for cell in tables if cell["value"] is not None]
+    assert amounts
+    for cell in amounts:
+        # Statement pages say 'in millions'
+        assert cell["scale"] == 6
+        assert cell["value"] == parse_number(cell["text"]) * 1e6
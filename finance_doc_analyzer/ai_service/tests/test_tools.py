@@ -0,0 +1,25 @@
+import pytest
+from tools import RiskTool
+
+
+def risk_score(text: str) -> int:
+    line = RiskTool()._run(text).splitlines()[1]
+    return int(line.split(": ")[1].split("/")[0])
+
+
+@pytest.mark.parametrize("text, score", [
+    # Scaled amounts count at their full value
+    ("Total debt of $5 million.", 20),
+    ("Balance sheet (in millions)\nLong-term debt 2.5", 20),
+    ("Total debt of $1.2 billion.", 20),
+    # Unit-less figures count as written
+    ("We issued 2,000,000 shares.", 20),
+    ("We issued 999,999 shares.", 0),
+    # Only the first figure is considered
+    ("Debt of $300 thousand, then $9 billion.", 0),
+    # Percentages, bare years and page markers are not figures
+    ("Margin rose 2,500,000% in 2024.", 0),
+    ("--- Page 1 ---\nDebt of $4,000,000.", 20),
+])
+def test_risk_amount_rule(text, score):
+    assert risk_score(text) == score
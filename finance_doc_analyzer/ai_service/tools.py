@@ -1,31 +1,46 @@
 import os
-import re
-import pdfplumber
 from dotenv import load_dotenv
 from crewai.tools import BaseTool
+from document_cache import get_pages
+from document_store import get_document_store, handle_digest
+from extraction import format_pages
+from keyword_scan import (
+    FINANCIAL_SECTIONS, KEY_TERMS, NEGATIVE_WORDS, RISK_KEYWORDS, scan_document, scan_document_until,
+    scan_text
+)
+from numeric_facts import describe_facts, facts_for_text, get_fact_table
+from tables import compute_kpis, describe_kpis, get_tables
+from retrieval import RETRIEVAL_TOKEN_BUDGET, RETRIEVAL_TOP_K, retrieve_chunks
 
 # Load environment variables from .env file
 load_dotenv()
 
 
+# ------------------------
+# Document references
+# ------------------------
+# Crews receive a doc:// handle into the document store; a filesystem path
+# still works for local runs and the benchmarks.
+def document_exists(document: str) -> bool:
+    digest = handle_digest(document)
+    if digest is not None:
+        return get_document_store().exists(digest)
+    return os.path.exists(document)
+
+
 # ------------------------
 # Helper function to extract text from a PDF
 # ------------------------
 def extract_pdf_text(path: str) -> str:
     """
     Extract full text from a PDF file. Returns error messages if file is missing or unreadable.
+    Page text is read through the shared document cache, so each PDF is parsed once.
     """
-    if not os.path.exists(path):
+    if not document_exists(path):
         return f"Error: File not found at path: {path}"
 
-    full_text = ""
     try:
-        with pdfplumber.open(path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                content = page.extract_text() or ""
-                # Replace consecutive newlines with single newline
-                content = content.replace("\n\n", "\n")
-                full_text += f"--- Page {page_num + 1} ---\n{content}\n"
+        full_text = format_pages(get_pages(path))
 
         if not full_text.strip():
             return "Error: No text content could be extracted from the PDF"
@@ -35,6 +50,36 @@ def extract_pdf_text(path: str) -> str:
         return f"Error reading PDF: {str(e)}"
 
 
+def is_document_path(document: str) -> bool:
+    if not document or len(document) >= 4096:
+        return False
+    if handle_digest(document) is not None:
+        return document_exists(document)
+    return os.path.isfile(document)
+
+
+def resolve_document_text(document: str) -> str:
+    """
+    Accept either document text or a reference to a PDF, as agents pass both.
+    """
+    if is_document_path(document):
+        return extract_pdf_text(document)
+    return document
+
+
+def resolve_keyword_scan(document: str):
+    """
+    Keyword scan for a PDF path (cached with the document) or for raw text.
+    """
+    if is_document_path(document):
+        try:
+            return scan_document(document)
+        except Exception:
+            # Unreadable PDFs are scanned as their error text, as before
+            return scan_text(extract_pdf_text(document))
+    return scan_text(document or "")
+
+
 # ------------------------
 # Financial Document Tool
 # ------------------------
@@ -53,6 +98,107 @@ class FinancialDocumentTool(BaseTool):
         return self._run(path)
 
 
+# ------------------------
+# Document Search Tool
+# ------------------------
+class DocumentSearchTool(BaseTool):
+    name: str = "search_financial_document"
+    description: str = (
+        "Searches a PDF financial document and returns only the passages most relevant "
+        "to a query, with their page numbers. Prefer this over reading the full text."
+    )
+
+    def _run(self, path: str, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        if not document_exists(path):
+            return f"Error: File not found at path: {path}"
+
+        try:
+            chunks = retrieve_chunks(path, query, top_k=top_k, token_budget=RETRIEVAL_TOKEN_BUDGET)
+        except Exception as e:
+            return f"Error searching PDF: {str(e)}"
+
+        if not chunks:
+            return f"No passages found matching query: '{query}'"
+
+        return "".join(
+            f"--- Page {chunk['page']} (relevance {chunk['score']:.2f}) ---\n{chunk['text']}\n"
+            for chunk in chunks
+        )
+
+    async def _arun(self, path: str, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        return self._run(path, query, top_k)
+
+
+def resolve_fact_table(document: str):
+    """
+    Numeric fact table for a PDF path (cached with the document) or for raw text.
+    """
+    if is_document_path(document):
+        try:
+            return get_fact_table(document)
+        except Exception:
+            return facts_for_text(extract_pdf_text(document))
+    return facts_for_text(document or "")
+
+
+# ------------------------
+# Financial Figures Tool
+# ------------------------
+class FinancialFiguresTool(BaseTool):
+    name: str = "query_financial_figures"
+    description: str = (
+        "Lists numeric figures extracted from a PDF financial document with page, fiscal "
+        "period and currency. Filters: currency (USD/EUR/GBP), min_value, max_value "
+        "(scaled to units, e.g. 1000000 for $1M), first_page, last_page. 0 means no filter."
+    )
+
+    def _run(self, path: str, currency: str = "", min_value: float = 0, max_value: float = 0,
+             first_page: int = 0, last_page: int = 0, limit: int = 20) -> str:
+        if not document_exists(path):
+            return f"Error: File not found at path: {path}"
+
+        try:
+            table = get_fact_table(path).query(
+                currency=currency or None,
+                min_value=min_value or None,
+                max_value=max_value or None,
+                first_page=first_page or None,
+                last_page=last_page or None,
+            )
+            return describe_facts(table, pages=get_pages(path), limit=limit)
+        except Exception as e:
+            return f"Error reading figures: {str(e)}"
+
+    async def _arun(self, path: str, currency: str = "", min_value: float = 0, max_value: float = 0,
+                    first_page: int = 0, last_page: int = 0, limit: int = 20) -> str:
+        return self._run(path, currency, min_value, max_value, first_page, last_page, limit)
+
+
+# ------------------------
+# Financial Metrics Tool
+# ------------------------
+class FinancialMetricsTool(BaseTool):
+    name: str = "compute_financial_metrics"
+    description: str = (
+        "Computes margins, growth and leverage ratios from the financial statement tables "
+        "of a PDF document and returns the line items and metrics per period."
+    )
+
+    def _run(self, path: str) -> str:
+        if not document_exists(path):
+            return f"Error: File not found at path: {path}"
+
+        try:
+            tables = get_tables(path)
+            table_count = len(set(tables["table_id"].to_pylist()))
+            return describe_kpis(compute_kpis(tables), table_count)
+        except Exception as e:
+            return f"Error computing metrics: {str(e)}"
+
+    async def _arun(self, path: str) -> str:
+        return self._run(path)
+
+
 # ------------------------
 # Investment Analysis Tool
 # ------------------------
@@ -64,11 +210,10 @@ class InvestmentTool(BaseTool):
         """
         Simple keyword-based investment analysis.
         """
-        processed_data = document_text.replace("  ", " ")
+        scan = resolve_keyword_scan(document_text)
         analysis = f"Investment Analysis for query: '{query}'\n\n"
 
-        key_terms = ['revenue', 'profit', 'loss', 'cash flow', 'assets', 'liabilities', 'equity']
-        found_terms = [term for term in key_terms if term.lower() in processed_data.lower()]
+        found_terms = scan.found(KEY_TERMS)
 
         if found_terms:
             analysis += f"Key financial indicators found: {', '.join(found_terms)}\n"
@@ -79,8 +224,7 @@ class InvestmentTool(BaseTool):
         return analysis
 
     def run(self, path: str, query: str = "") -> str:
-        document_text = extract_pdf_text(path)
-        return self._run(document_text, query)
+        return self._run(path, query)
 
     async def _arun(self, path: str, query: str = "") -> str:
         return self.run(path, query)
@@ -97,31 +241,27 @@ class RiskTool(BaseTool):
         """
         Performs a simple risk assessment using keyword scanning and numeric heuristics.
         """
-        document_lower = document_text.lower()
-        numbers = [float(x.replace(',', '')) for x in
-                   re.findall(r"\$?([\d,]+\.?\d*)", document_text)] if document_text else []
+        scan = resolve_keyword_scan(document_text)
+        amounts = resolve_fact_table(document_text).monetary().value
 
         risk_score = 0
         risk_factors = []
 
         # Keywords scanning
-        risk_keywords = [
-            'risk', 'market risk', 'credit risk', 'operational risk',
-            'financial risk', 'uncertainty', 'volatility', 'exposure'
-        ]
-        found_keywords = [k for k in risk_keywords if k in document_lower]
+        found_keywords = scan.found(RISK_KEYWORDS)
         if found_keywords:
             risk_score += min(len(found_keywords) * 10, 50)
             risk_factors.append(f"Found risk indicators: {', '.join(found_keywords)}")
 
-        # Numeric heuristics
-        if numbers and numbers[0] > 1_000_000:
+        # Numeric heuristics: the first figure that is not a percentage or a
+        # bare year, scaled to units ('$5 million' and '5' under an 'in
+        # millions' header are both 5,000,000). Page markers are not figures.
+        if len(amounts) and amounts[0] > 1_000_000:
             risk_score += 20
             risk_factors.append("High debt levels detected")
 
         # Negative words
-        negative_words = ['loss', 'deficit', 'decline', 'decrease']
-        if any(word in document_lower for word in negative_words):
+        if scan.found(NEGATIVE_WORDS):
             risk_score += 20
             risk_factors.append("Negative financial indicators detected")
 
@@ -144,32 +284,57 @@ class RiskTool(BaseTool):
 # ------------------------
 # Document Verification Tool
 # ------------------------
+# Shorter documents are flagged as possibly incomplete
+VERIFY_MIN_TEXT_LENGTH = 500
+
+
+def verification_passed(scan) -> bool:
+    """
+    Every check of DocumentVerifierTool holds for the scan so far.
+    """
+    return (
+        scan.text_length >= VERIFY_MIN_TEXT_LENGTH
+        and bool(scan.found(FINANCIAL_SECTIONS))
+        and scan.has_pattern("year")
+        and scan.has_pattern("currency")
+    )
+
+
+def resolve_verification_scan(document: str):
+    """
+    Like resolve_keyword_scan, but a PDF not yet extracted is read page by
+    page only until every verification check passes.
+    """
+    if is_document_path(document):
+        try:
+            return scan_document_until(document, verification_passed)
+        except Exception:
+            return scan_text(extract_pdf_text(document))
+    return scan_text(document or "")
+
+
 class DocumentVerifierTool(BaseTool):
     name: str = "verify_financial_document"
     description: str = "Verifies financial document content for completeness and relevance."
 
     def _run(self, document_text: str, query: str = "") -> str:
-        processed_data = document_text.replace("  ", " ").lower()
+        scan = resolve_verification_scan(document_text)
         issues_found = []
 
         # Check document length
-        if len(processed_data.strip()) < 500:
+        if scan.text_length < VERIFY_MIN_TEXT_LENGTH:
             issues_found.append("Document seems too short, may be incomplete.")
 
         # Check for financial sections
-        sections = [
-            'balance sheet', 'income statement', 'cash flow', 'profit & loss',
-            'financial summary', 'statement of operations'
-        ]
-        found_sections = [s for s in sections if s in processed_data]
+        found_sections = scan.found(FINANCIAL_SECTIONS)
         if not found_sections:
             issues_found.append(
                 "No standard financial sections detected (balance sheet, income statement, cash flow, etc.)")
 
         # Check for years and currency
-        if not re.search(r'\b20\d{2}\b', processed_data):
+        if not scan.has_pattern("year"):
             issues_found.append("No year detected.")
-        if not re.search(r'\$\d+', processed_data):
+        if not scan.has_pattern("currency"):
             issues_found.append("No currency amounts detected.")
 
         verification_result = f"Document Verification for query: '{query}'\n"
@@ -179,4 +344,9 @@ class DocumentVerifierTool(BaseTool):
             verification_result += "Document appears complete and relevant for analysis.\n"
 
         verification_result += f"Found Sections: {', '.join(found_sections) if found_sections else 'None'}"
+        if not scan.complete:
+            verification_result += (
+                f"\nPartial scan: all checks passed by page {scan.page_count}; "
+                "the remaining pages were not read."
+            )
         return verification_result
\ No newline at end of file
@@ -0,0 +1,188 @@
+import gc
+import heapq
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from celery.concurrency import get_implementation
+from celery.signals import task_postrun, task_prerun, worker_init
+from celery_app import WORKER_MAX_RSS_MB
+from document_store import is_digest
+import metrics
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Seconds between RSS samples while tasks run
+RSS_SAMPLE_INTERVAL = float(os.getenv("RSS_SAMPLE_INTERVAL", "0.1"))
+# Above this fraction of WORKER_MAX_RSS_MB a finished task triggers a full
+# garbage collection before the recycle check
+GC_RSS_FRACTION = float(os.getenv("WORKER_GC_RSS_FRACTION", "0.75"))
+# Heaviest tasks kept for the task_memory_stats inspect command
+HEAVY_TASKS_KEPT = int(os.getenv("HEAVY_TASKS_KEPT", "20"))
+
+MAX_RSS_BYTES = WORKER_MAX_RSS_MB * 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+logger = logging.getLogger(__name__)
+
+
+def rss_bytes():
+    """
+    Resident memory of this process, or None where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+# ------------------------
+# Per-task peak RSS
+# ------------------------
+class RssMonitor:
+    """
+    Samples this process's RSS while tasks run and keeps the peak seen by
+    each. Tasks sharing a process (thread and gevent pools) share its RSS, so
+    a task's peak is the process peak during its run.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._peaks = {}
+        self._lock = threading.Lock()
+        self._sampler_pid = None
+
+    def start(self, task_id: str):
+        rss = rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            self._peaks[task_id] = rss
+            # The sampler thread does not survive a fork: start one per process
+            if self._sampler_pid != os.getpid():
+                self._sampler_pid = os.getpid()
+                threading.Thread(target=self._sample, name="rss-monitor", daemon=True).start()
+
+    def stop(self, task_id: str):
+        """
+        (peak, current) RSS for a finished task, or None if it was not tracked.
+        """
+        rss = rss_bytes()
+        with self._lock:
+            peak = self._peaks.pop(task_id, None)
+        if peak is None or rss is None:
+            return None
+        return max(peak, rss), rss
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            rss = rss_bytes() or 0
+            with self._lock:
+                for task_id, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[task_id] = rss
+
+
+rss_monitor = RssMonitor()
+
+_heavy_tasks = []
+_heavy_lock = threading.Lock()
+
+
+def _record_heavy(peak: int, entry: dict):
+    with _heavy_lock:
+        item = (peak, time.time(), entry)
+        if len(_heavy_tasks) < HEAVY_TASKS_KEPT:
+            heapq.heappush(_heavy_tasks, item)
+        elif peak > _heavy_tasks[0][0]:
+            heapq.heapreplace(_heavy_tasks, item)
+
+
+def heavy_tasks() -> list:
+    """
+    The tasks with the highest peak RSS seen by this process, heaviest first.
+    """
+    with _heavy_lock:
+        return [entry for _, _, entry in sorted(_heavy_tasks, key=lambda item: item[:2], reverse=True)]
+
+
+def _task_digest(args, kwargs):
+    digest = (kwargs or {}).get("digest")
+    if digest:
+        return digest
+    return next((arg for arg in args or () if is_digest(arg)), None)
+
+
+# ------------------------
+# Recycling
+# ------------------------
+# Prefork children are replaced by the pool itself (worker_max_memory_per_child
+# in celery_app.py); other pools run tasks in the worker process, which asks
+# to be shut down and is restarted by its supervisor (restart: in Compose)
+_recycle_process = False
+_recycle_requested = False
+
+
+def _recycle_if_needed(task, rss: int) -> int:
+    global _recycle_requested
+    if rss < MAX_RSS_BYTES * GC_RSS_FRACTION:
+        return rss
+    # Crew runs leave reference cycles (agents, executors, tools) behind
+    gc.collect()
+    rss = rss_bytes() or rss
+    if rss < MAX_RSS_BYTES or not _recycle_process or _recycle_requested:
+        return rss
+
+    _recycle_requested = True
+    logger.warning(
+        "Worker RSS %d MiB exceeds %d MiB; shutting down after running tasks finish",
+        rss // (1024 * 1024), WORKER_MAX_RSS_MB,
+    )
+    task.app.control.shutdown(destination=[task.request.hostname])
+    return rss
+
+
+# ------------------------
+# Celery signal handlers
+# ------------------------
+@worker_init.connect
+def _detect_pool(sender=None, **kwargs):
+    global _recycle_process
+    _recycle_process = bool(MAX_RSS_BYTES) and (
+        get_implementation(sender.pool_cls).__module__ != "celery.concurrency.prefork"
+    )
+
+
+@task_prerun.connect
+def _track_task_memory(task_id=None, **kwargs):
+    rss_monitor.start(task_id)
+
+
+@task_postrun.connect
+def _report_task_memory(task_id=None, task=None, args=None, kwargs=None, **extra):
+    usage = rss_monitor.stop(task_id)
+    if usage is None:
+        return
+    peak, rss = usage
+    if MAX_RSS_BYTES:
+        rss = _recycle_if_needed(task, rss)
+
+    label = metrics.task_label(task.name)
+    metrics.observe_task_rss(label, peak, rss)
+    digest = _task_digest(args, kwargs)
+    logger.info(
+        "Task %s %s (document %s): peak RSS %.1f MiB, %.1f MiB after",
+        label, task_id, digest, peak / (1024 * 1024), rss / (1024 * 1024),
+    )
+    _record_heavy(peak, {
+        "task": label,
+        "task_id": task_id,
+        "digest": digest,
+        "peak_rss_bytes": peak,
+        "rss_after_bytes": rss,
+    })